@@ -1,8 +1,11 @@
 import random
 import math
+import numpy as np
+from tile_coding import TileCoder
 
 class Agent:
-    def __init__(self, lr, discount_factor, epsilon, epsilon_decay, min_epsilon=0.001, num_actions=3):
+    def __init__(self, lr, discount_factor, epsilon, epsilon_decay, min_epsilon=0.001, num_actions=3,
+                 trace_lambda=0.0, trace_threshold=0.01):
         self.q_table = {}
         self.lr = lr
         self.gamma = discount_factor
@@ -11,6 +14,12 @@ class Agent:
         self.min_epsilon = min_epsilon
         self.num_actions = num_actions
 
+        # Watkins Q(λ)：trace_lambda > 0 時啟用 eligibility trace
+        # traces 只記錄最近走過的 (state, action)，衰減到 trace_threshold 以下就刪掉，所以每步只更新少數幾格
+        self.trace_lambda = trace_lambda
+        self.trace_threshold = trace_threshold
+        self.traces = {}
+
     def get_state(self, sensor_values):
         bins = [int(min(s // 5, 5)) for s in sensor_values] # 5~10 10~15, 5 for each segment
         return tuple(bins)
@@ -40,22 +49,51 @@ class Agent:
 
         # Epsilon-Greedy
         if random.random() < self.epsilon:
-            return random.randint(0, self.num_actions - 1)
+            action = random.randint(0, self.num_actions - 1)
         else:
-            return int(self.argmax(self.q_table[state])) 
+            action = int(self.argmax(self.q_table[state]))
+        self.cut_traces(state, action)
+        return action
 
-    def update_q_table(self, state, action, reward, next_state):
+    def update_q_table(self, state, action, reward, next_state, discount=None):
+        # discount 沒給就是 gamma；一次快轉 k 步的 transition 要傳 gamma ** k
+        discount = self.gamma if discount is None else discount
         if state not in self.q_table:
             self.q_table[state] = [0.0] * self.num_actions
         if next_state not in self.q_table:
             self.q_table[next_state] = [0.0] * self.num_actions
 
         expected_q = self.q_table[state][action] # expected total reward
-        observed_q = reward + self.gamma *  max(self.q_table[next_state])
+        observed_q = reward + discount *  max(self.q_table[next_state])
         TD_error = observed_q - expected_q
+        if self.trace_lambda > 0:
+            self.update_traces(state, action, TD_error, discount)
+            return
         updated_q = expected_q + self.lr * TD_error
         self.q_table[state][action] = updated_q
 
+    def update_traces(self, state, action, td_error, discount=None):
+        # replacing trace：目前的 (state, action) 設為 1，所有還有 trace 的格子依比例更新後再衰減
+        self.traces[(state, action)] = 1.0
+        decay = (self.gamma if discount is None else discount) * self.trace_lambda
+        for key, e in list(self.traces.items()):
+            s, a = key
+            self.q_table[s][a] += self.lr * td_error * e
+            e *= decay
+            if e < self.trace_threshold:
+                del self.traces[key]
+            else:
+                self.traces[key] = e
+
+    def cut_traces(self, state, action):
+        # Watkins：選了非 greedy 的動作，之前的 trace 就不能再往回傳
+        if self.traces and self.q_table[state][action] < max(self.q_table[state]):
+            self.traces.clear()
+
+    def reset_traces(self):
+        # episode 結束時呼叫
+        self.traces.clear()
+
     def decay_epsilon(self):
         self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
         print("Epsilon: " + str(self.epsilon))
@@ -68,3 +106,271 @@ class Agent:
 
     def reset_q_table(self):
         self.q_table = {}
+        self.traces = {}
+
+    def greedy_action(self, state):
+        # 測試用：完全 greedy（沒看過的 state 視為全 0）
+        q_values = self.q_table.get(state, [0] * self.num_actions)
+        return q_values.index(max(q_values))
+
+class DenseAgent(Agent):
+    """
+    用 numpy 陣列當 Q-table 的版本：state 是把每個感測器的 bin 當成 num_bins 進位數字算出來的整數
+    Q-table 大小固定 (num_bins ** num_sensors, num_actions)，查表、更新都是陣列索引
+    另外提供一次處理很多筆 state 的 encode_states / select_actions / update_q_table_batch
+    """
+    def __init__(self, lr, discount_factor, epsilon, epsilon_decay, min_epsilon=0.001, num_actions=3,
+                 num_sensors=3, num_bins=6, bin_width=5, rng=None, trace_lambda=0.0, trace_threshold=0.01):
+        super().__init__(lr, discount_factor, epsilon, epsilon_decay, min_epsilon, num_actions,
+                         trace_lambda, trace_threshold)
+        self.num_sensors = num_sensors
+        self.num_bins = num_bins
+        self.bin_width = bin_width
+        self.num_states = num_bins ** num_sensors
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # 第 i 個感測器的位數權重，跟 tuple 的字典序一致：code = ((b0 * B) + b1) * B + b2
+        self.place_values = num_bins ** np.arange(num_sensors - 1, -1, -1)
+        self.q_table = np.zeros((self.num_states, num_actions))
+        self.reset_batch_traces()
+
+    def get_state(self, sensor_values):
+        code = 0
+        for s in sensor_values:
+            code = code * self.num_bins + int(min(s // self.bin_width, self.num_bins - 1))
+        return code
+
+    def encode_states(self, sensor_values):
+        # (N, num_sensors) -> (N,) 的 state code
+        bins = np.minimum(np.asarray(sensor_values, dtype=float) // self.bin_width, self.num_bins - 1).astype(np.int64)
+        return bins @ self.place_values
+
+    def decode_state(self, code):
+        # state code -> 原本 get_state 的 tuple（log 用）
+        return tuple(int(code) // int(p) % self.num_bins for p in self.place_values)
+
+    def select_action(self, state):
+        # Epsilon-Greedy
+        if random.random() < self.epsilon:
+            action = random.randint(0, self.num_actions - 1)
+        else:
+            # 先複製成 list：Q-table 可能在共用記憶體裡被其他 process 同時改（hogwild）
+            action = int(self.argmax(self.q_table[state].tolist()))
+        self.cut_traces(state, action)
+        return action
+
+    def select_actions(self, states, epsilon=None):
+        # 向量化的 epsilon-greedy，平手時隨機選一個
+        states = np.asarray(states, dtype=np.int64)
+        epsilon = self.epsilon if epsilon is None else epsilon
+        greedy = self.greedy_actions(states)
+        explore = self.rng.random(len(states)) < epsilon
+        random_actions = self.rng.integers(0, self.num_actions, len(states))
+        return np.where(explore, random_actions, greedy)
+
+    def greedy_actions(self, states):
+        q = self.q_table[np.asarray(states, dtype=np.int64)]
+        is_max = q == q.max(axis=1, keepdims=True)
+        return np.argmax(is_max * self.rng.random(q.shape), axis=1)
+
+    def update_q_table(self, state, action, reward, next_state, discount=None):
+        q = self.q_table
+        discount = self.gamma if discount is None else discount
+        td_error = reward + discount * q[next_state].max() - q[state, action]
+        if self.trace_lambda > 0:
+            self.update_traces(state, action, td_error, discount)
+            return
+        q[state, action] += self.lr * td_error
+
+    def update_q_table_batch(self, states, actions, rewards, next_states, dones=None, lr=None, weights=None):
+        """
+        一次做很多筆 TD 更新（in-place）
+        dones 有給的話終止狀態不往後 bootstrap；沒給就跟 update_q_table 一樣照常 bootstrap
+        lr 沒給就用 self.lr（replay 的更新通常要比線上更新小）
+        weights 是每筆的更新權重（prioritized replay 的 importance-sampling 權重），回傳的 TD error 不乘權重
+        同一個 (state, action) 出現多次時刻意取各筆 TD error 的平均、只走一步 lr，不是 K 筆依序各走一步：
+        K 台車同時踩到同一格時，這一格的學習速度會比 K 次依序更新慢（依序更新約是 1 - (1 - lr)^K 的步幅）
+        直接相加（np.add.at）的話步幅是 K * lr，lr 稍大（例如 0.31）、K 大於 3 就會衝過頭發散
+        :return: 每筆的 TD error（prioritized replay 用來更新 priority）
+        """
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        next_max = self.q_table[np.asarray(next_states, dtype=np.int64)].max(axis=1)
+        if dones is not None:
+            next_max = np.where(dones, 0.0, next_max)
+        td_error = np.asarray(rewards, dtype=float) + self.gamma * next_max - self.q_table[states, actions]
+        # 重複的 (state, action) 取平均更新量（見上面的說明）
+        flat = states * self.num_actions + actions
+        cells, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+        weighted = td_error if weights is None else td_error * np.asarray(weights, dtype=float)
+        mean_td = np.bincount(inverse, weights=weighted) / counts
+        self.q_table.reshape(-1)[cells] += (self.lr if lr is None else lr) * mean_td
+        return td_error
+
+    def update_q_table_traces_batch(self, states, actions, rewards, next_states):
+        """
+        K 個環境同時做 Watkins Q(λ) 更新，每個環境有自己的 trace（BatchQLearningTrainer 用）
+        trace 存成三個平行陣列 (環境編號, Q-table 的格子, trace 值)，跟 dict 版本一樣只留下還沒衰減完的格子
+        :return: 每個環境的 TD error
+        """
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        q = self.q_table
+        td_error = np.asarray(rewards, dtype=float) + self.gamma * q[next_states].max(axis=1) - q[states, actions]
+
+        # replacing trace：每個環境目前的格子設為 1（先把同一格的舊 trace 拿掉）
+        cells = states * self.num_actions + actions
+        keep = cells[self.batch_trace_envs] != self.batch_trace_cells
+        envs = np.concatenate([self.batch_trace_envs[keep], np.arange(len(states))])
+        trace_cells = np.concatenate([self.batch_trace_cells[keep], cells])
+        values = np.concatenate([self.batch_trace_values[keep], np.ones(len(states))])
+
+        # 不同環境可能在同一格有 trace，要用 add.at 才會全部加上去
+        np.add.at(q.reshape(-1), trace_cells, self.lr * td_error[envs] * values)
+
+        values *= self.gamma * self.trace_lambda
+        alive = values >= self.trace_threshold
+        self.batch_trace_envs = envs[alive]
+        self.batch_trace_cells = trace_cells[alive]
+        self.batch_trace_values = values[alive]
+        return td_error
+
+    def cut_traces_batch(self, states, actions):
+        # Watkins：選了非 greedy 動作的環境，清掉自己之前的 trace
+        q = self.q_table[np.asarray(states, dtype=np.int64)]
+        exploratory = q[np.arange(len(q)), actions] < q.max(axis=1)
+        self.reset_batch_traces(exploratory)
+
+    def reset_batch_traces(self, mask=None):
+        # mask 為 True 的環境（例如剛結束 episode 的）清掉 trace；沒給就全部清掉
+        if mask is None:
+            self.batch_trace_envs = np.zeros(0, dtype=np.int64)
+            self.batch_trace_cells = np.zeros(0, dtype=np.int64)
+            self.batch_trace_values = np.zeros(0)
+            return
+        keep = ~np.asarray(mask, dtype=bool)[self.batch_trace_envs]
+        self.batch_trace_envs = self.batch_trace_envs[keep]
+        self.batch_trace_cells = self.batch_trace_cells[keep]
+        self.batch_trace_values = self.batch_trace_values[keep]
+
+    def greedy_action(self, state):
+        q_values = self.q_table[state]
+        return int(np.argmax(q_values))
+
+    def reset_q_table(self):
+        self.q_table = np.zeros((self.num_states, self.num_actions))
+        self.traces = {}
+        self.reset_batch_traces()
+
+class ConfigBatchAgent(DenseAgent):
+    """
+    很多組參數（lr、gamma、epsilon 的衰減）一起訓練：q_table 形狀 (num_configs, num_states, num_actions)
+    第 i 組參數只讀寫 q_table[i]，搭配 K = num_configs 的 BatchCarEnv，第 i 台車就是第 i 組參數的環境
+    只支援一次處理全部參數組的 select_actions / update_q_table_batch / decay_epsilon
+    """
+    def __init__(self, configs, num_actions=3, num_sensors=3, num_bins=6, bin_width=5, rng=None):
+        self.configs = [dict(c) for c in configs]
+        if any(c.get("trace_lambda", 0) > 0 for c in self.configs):
+            raise ValueError("ConfigBatchAgent does not support eligibility traces (trace_lambda must be 0)")
+
+        def column(name, default=None):
+            return np.array([c.get(name, default) for c in self.configs], dtype=float)
+
+        super().__init__(
+            lr=column("lr"),
+            discount_factor=column("discount_factor"),
+            epsilon=column("epsilon"),
+            epsilon_decay=column("epsilon_decay"),
+            min_epsilon=column("min_epsilon", 0.001),
+            num_actions=num_actions, num_sensors=num_sensors, num_bins=num_bins, bin_width=bin_width, rng=rng
+        )
+        self.num_configs = len(self.configs)
+        self.rows = np.arange(self.num_configs)
+        self.q_table = np.zeros((self.num_configs, self.num_states, num_actions))
+
+    def select_actions(self, states, epsilon=None):
+        # states[i] 是第 i 組參數的 state，每組用自己的 epsilon
+        epsilon = self.epsilon if epsilon is None else epsilon
+        greedy = self.greedy_actions(states)
+        explore = self.rng.random(self.num_configs) < epsilon
+        random_actions = self.rng.integers(0, self.num_actions, self.num_configs)
+        return np.where(explore, random_actions, greedy)
+
+    def greedy_actions(self, states):
+        q = self.q_table[self.rows, np.asarray(states, dtype=np.int64)]
+        is_max = q == q.max(axis=1, keepdims=True)
+        return np.argmax(is_max * self.rng.random(q.shape), axis=1)
+
+    def update_q_table_batch(self, states, actions, rewards, next_states, dones=None):
+        # 每組參數一筆 transition，各自用自己的 lr、gamma
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        next_max = self.q_table[self.rows, np.asarray(next_states, dtype=np.int64)].max(axis=1)
+        if dones is not None:
+            next_max = np.where(dones, 0.0, next_max)
+        td_error = np.asarray(rewards, dtype=float) + self.gamma * next_max - self.q_table[self.rows, states, actions]
+        self.q_table[self.rows, states, actions] += self.lr * td_error
+        return td_error
+
+    def decay_epsilon(self, mask=None):
+        # 只衰減 mask 為 True（這一步結束 episode）的參數組；參數組很多，所以不 print
+        decayed = np.maximum(self.min_epsilon, self.epsilon * self.epsilon_decay)
+        self.epsilon = decayed if mask is None else np.where(mask, decayed, self.epsilon)
+
+    def reset_q_table(self):
+        self.q_table = np.zeros((self.num_configs, self.num_states, self.num_actions))
+
+    def agent(self, index):
+        # 取出第 index 組參數訓練好的 DenseAgent（GUI 測試或存檔用）
+        config = self.configs[index]
+        agent = DenseAgent(
+            lr=config["lr"], discount_factor=config["discount_factor"],
+            epsilon=float(self.epsilon[index]), epsilon_decay=config["epsilon_decay"],
+            min_epsilon=config.get("min_epsilon", 0.001), num_actions=self.num_actions,
+            num_sensors=self.num_sensors, num_bins=self.num_bins, bin_width=self.bin_width
+        )
+        agent.q_table = self.q_table[index].copy()
+        return agent
+
+class TileCodingAgent(Agent):
+    """
+    用 TileCoder 取代 get_state 的粗 bin：state 是 num_tilings 個權重索引的 tuple
+    Q(s, a) = 這些格子的權重相加，更新時每一格分到 lr / num_tilings 的 TD error
+    權重陣列大小固定 (memory_size, num_actions)，每步的計算量只跟 num_tilings 有關
+    """
+    def __init__(self, lr, discount_factor, epsilon, epsilon_decay, min_epsilon=0.001, num_actions=3, coder=None):
+        super().__init__(lr, discount_factor, epsilon, epsilon_decay, min_epsilon, num_actions)
+        self.coder = coder if coder is not None else TileCoder()
+        self.q_table = np.zeros((self.coder.memory_size, num_actions))
+
+    def get_state(self, sensor_values):
+        return self.coder.encode(sensor_values)
+
+    def encode_states(self, sensor_values):
+        # (N, num_sensors) -> (N, num_tilings)
+        return self.coder.encode_batch(sensor_values)
+
+    def q_values(self, state):
+        return self.q_table[list(state)].sum(axis=0)
+
+    def q_values_batch(self, states):
+        # (N, num_tilings) -> (N, num_actions)
+        return self.q_table[np.asarray(states, dtype=np.int64)].sum(axis=1)
+
+    def select_action(self, state):
+        # Epsilon-Greedy
+        if random.random() < self.epsilon:
+            return random.randint(0, self.num_actions - 1)
+        return int(self.argmax(self.q_values(state).tolist()))
+
+    def update_q_table(self, state, action, reward, next_state, discount=None):
+        tiles = list(state)
+        discount = self.gamma if discount is None else discount
+        td_error = reward + discount * self.q_values(next_state).max() - self.q_table[tiles, action].sum()
+        # hash 碰撞時同一個 state 的兩層可能對到同一格，要用 add.at 才會兩份更新都加上去
+        np.add.at(self.q_table, (tiles, action), self.lr / self.coder.num_tilings * td_error)
+
+    def greedy_action(self, state):
+        return int(np.argmax(self.q_values(state)))
+
+    def reset_q_table(self):
+        self.q_table = np.zeros((self.coder.memory_size, self.num_actions))
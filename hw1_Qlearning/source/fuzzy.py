@@ -0,0 +1,159 @@
+from enum import Enum
+import numpy as np
+
+class Level(Enum):
+    SMALL = 0
+    MEDIUM = 1
+    LARGE = 2
+
+class MembershipFunctions:
+    @staticmethod
+    def side_small(distance):
+        if distance < 10:
+            return 1
+        elif distance < 12:
+            return (12 - distance) / 2
+        else:
+            return 0
+
+    @staticmethod
+    def side_medium(distance):
+        if 8 < distance <= 12:
+            return (distance - 8) / 4
+        elif 12 < distance <= 16:
+            return (16 - distance) / 4
+        else:
+            return 0
+
+    @staticmethod
+    def side_large(distance):
+        if 13 < distance <= 20:
+            return (distance - 13) / 7
+        elif distance > 20:
+            return 1
+        else:
+            return 0
+
+    @staticmethod
+    def front_small(distance):
+        if distance < 10:
+            return 1
+        elif distance < 15:
+            return (15 - distance) / 5
+        else:
+            return 0
+
+    @staticmethod
+    def front_medium(distance):
+        if 19 < distance <= 21:
+            return (distance - 19) / 2
+        elif 21 < distance <= 23:
+            return (23 - distance) / 2
+        else:
+            return 0
+
+    @staticmethod
+    def front_large(distance):
+        if distance > 30:
+            return 1
+        else:
+            return 0
+
+    # 以下是陣列版本：條件跟上面的 if/elif 一模一樣（同樣的順序、同樣的算式），回傳 (N, 3) 的 [small, medium, large]
+    @staticmethod
+    def side_batch(distance):
+        d = np.asarray(distance, dtype=float)
+        small = np.select([d < 10, d < 12], [1.0, (12 - d) / 2], 0.0)
+        medium = np.select([(8 < d) & (d <= 12), (12 < d) & (d <= 16)], [(d - 8) / 4, (16 - d) / 4], 0.0)
+        large = np.select([(13 < d) & (d <= 20), d > 20], [(d - 13) / 7, 1.0], 0.0)
+        return np.stack([small, medium, large], axis=-1)
+
+    @staticmethod
+    def front_batch(distance):
+        d = np.asarray(distance, dtype=float)
+        small = np.select([d < 10, d < 15], [1.0, (15 - d) / 5], 0.0)
+        medium = np.select([(19 < d) & (d <= 21), (21 < d) & (d <= 23)], [(d - 19) / 2, (23 - d) / 2], 0.0)
+        large = np.where(d > 30, 1.0, 0.0)
+        return np.stack([small, medium, large], axis=-1)
+
+class Fuzzifier:
+    @staticmethod
+    def to_level(s, m, l):
+        return Level([s, m, l].index(max([s, m, l])))
+
+    @staticmethod
+    def l_point(distance):
+        s = MembershipFunctions.side_small(distance)
+        m = MembershipFunctions.side_medium(distance)
+        l = MembershipFunctions.side_large(distance)
+        return Fuzzifier.to_level(s, m, l)
+
+    @staticmethod
+    def r_point(distance):
+        s = MembershipFunctions.side_small(distance)
+        m = MembershipFunctions.side_medium(distance)
+        l = MembershipFunctions.side_large(distance)
+        return Fuzzifier.to_level(s, m, l)
+
+    @staticmethod
+    def c_point(distance):
+        s = MembershipFunctions.front_small(distance)
+        m = MembershipFunctions.front_medium(distance)
+        l = MembershipFunctions.front_large(distance)
+        return Fuzzifier.to_level(s, m, l)
+
+    # 陣列版本回傳 Level 的 value（0 / 1 / 2），argmax 跟 list.index(max) 一樣是平手時取第一個
+    @staticmethod
+    def side_levels(distances):
+        return np.argmax(MembershipFunctions.side_batch(distances), axis=-1)
+
+    @staticmethod
+    def front_levels(distances):
+        return np.argmax(MembershipFunctions.front_batch(distances), axis=-1)
+
+class Rules:
+    @staticmethod
+    def apply(l_point, c_point, r_point):
+        if r_point == Level.SMALL:
+            return -40
+        if l_point == Level.SMALL:
+            return 40
+        if r_point == Level.MEDIUM and c_point == Level.SMALL:
+            return -20
+        if l_point == Level.MEDIUM and c_point == Level.SMALL:
+            return 20
+        return 0
+
+    @staticmethod
+    def apply_batch(l_levels, c_levels, r_levels):
+        # np.select 取第一個成立的條件，跟上面 if 的先後順序相同
+        small, medium = Level.SMALL.value, Level.MEDIUM.value
+        conditions = [
+            r_levels == small,
+            l_levels == small,
+            (r_levels == medium) & (c_levels == small),
+            (l_levels == medium) & (c_levels == small),
+        ]
+        return np.select(conditions, [-40, 40, -20, 20], 0)
+
+class FuzzyController:
+    def __init__(self):
+        self.fuzzifier = Fuzzifier()
+
+    def decide_action(self, sensor_data):
+        right, front, left = sensor_data
+        l_point = self.fuzzifier.l_point(left)
+        c_point = self.fuzzifier.c_point(front)
+        r_point = self.fuzzifier.r_point(right)
+        return Rules.apply(l_point, c_point, r_point)
+
+    def decide_actions(self, sensor_data):
+        """
+        decide_action 的向量化版本，結果完全相同
+        :param sensor_data: (N, 3) 的 (right, front, left)
+        :return: (N,) 的方向盤角度
+        """
+        sensor_data = np.asarray(sensor_data, dtype=float)
+        right, front, left = sensor_data[..., 0], sensor_data[..., 1], sensor_data[..., 2]
+        return Rules.apply_batch(Fuzzifier.side_levels(left), Fuzzifier.front_levels(front),
+                                 Fuzzifier.side_levels(right))
@@ -1,15 +1,24 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QTextEdit, QGraphicsView, QGraphicsScene, QFileDialog, QFormLayout, QGridLayout, QGroupBox, QSlider
+    QLineEdit, QTextEdit, QGraphicsView, QGraphicsScene, QFileDialog, QFormLayout, QGridLayout, QGroupBox, QSlider, QApplication
 )
 from PyQt5.QtGui import QPolygonF, QPen, QColor, QPainterPath, QBrush
 from PyQt5.QtCore import QPointF, Qt, QTimer
-from geometry import parse_track_file, border_to_segments, is_circle_near_segment
-from car import Car
+from track import Track
+from env import CarEnv
+from sensors import SensorArray
 import math
 from agent import Agent
+from trainer import QLearningTrainer
+from sweep import Sweep, BASELINE_CONFIG, one_at_a_time
+from reward_stats import RewardStats
+from policy import GreedyPolicy, SUFFIX
 import matplotlib.pyplot as plt
-import random
+
+# 原本的 smooth(values, window=w) 是對 values[i-w : i+1] 取平均，實際上涵蓋 w + 1 個 episode
+# 曲線圖是 smooth(window=200) 再 smooth(window=50)，這裡用一樣的範圍畫出來的圖才會跟以前相同
+SMOOTH_WINDOW = 201
+TREND_WINDOW = 51
 
 class TrackWindow(QWidget):
     def __init__(self):
@@ -34,10 +43,13 @@ class TrackWindow(QWidget):
         main_layout.addWidget(self.view, 3)  # 右邊佔 3 份寬度
         
         self.agent = None
+        self.env = None       # 不依賴 GUI 的模擬環境，畫面只負責顯示 env.car
+        self.trainer = None
         self.car = None
         self.car_item = None
         self.car_dir_line = None
-        self.border_points = []
+        self.track = None
+        self.track_path = None
         self.SCALE = 4
         self.STEP = 1
         self.current_episode = 0
@@ -46,13 +58,9 @@ class TrackWindow(QWidget):
         self.path = QPainterPath()           # 記錄所有點
         self.trajectory_item = None          # 對應的 QG
         self.is_testing = False
-        self.step_reward = 1
-
-        self.reward_history = []
-        self.step_count = 0
-        self.total_reward = 0
 
         self.angle_choices = [-40, 0, 40]
+        self.sensors = SensorArray()  # 預設三條感測器
         # self.agent = Agent(
         #    lr=float(self.lr_input.text()),
         #    discount_factor=float(self.discounted_factor.text()),
@@ -82,6 +90,14 @@ class TrackWindow(QWidget):
         self.discounted_factor = QLineEdit("0.97")
         self.param_layout.addRow(QLabel("Discount Factor"), self.discounted_factor)
 
+        # Lambda（Q(λ) 的 trace 衰減，0 就是原本的 one-step Q-learning）
+        self.lambda_input = QLineEdit("0")
+        self.param_layout.addRow(QLabel("Lambda"), self.lambda_input)
+
+        # Sensor Beams（感測器射線數，平均分布在 -45° ~ 45°）
+        self.sensor_beams_input = QLineEdit("3")
+        self.param_layout.addRow(QLabel("Sensor Beams"), self.sensor_beams_input)
+
         # Step
         # self.step = QLineEdit("500")
         # self.param_layout.addRow(QLabel("Step"), self.step)
@@ -90,6 +106,14 @@ class TrackWindow(QWidget):
         self.episode_label = QLineEdit("300")
         self.param_layout.addRow(QLabel("Episode"), self.episode_label)
 
+        # 每個 episode 的步數上限，避免繞圈的 policy 永遠不結束
+        self.max_steps_input = QLineEdit("1000")
+        self.param_layout.addRow(QLabel("Max Steps"), self.max_steps_input)
+
+        # Patience：連續幾個 episode reward 沒進步就提早停止批次訓練（0 = 不提早停）
+        self.patience_input = QLineEdit("0")
+        self.param_layout.addRow(QLabel("Patience"), self.patience_input)
+
         self.control_layout.addLayout(self.param_layout)
 
         # 執行速度調整 + 顯示文字
@@ -126,6 +150,10 @@ class TrackWindow(QWidget):
         self.run_all_btn.clicked.connect(self.run_all_experiments)
         self.control_layout.addWidget(self.run_all_btn)
 
+        self.export_btn = QPushButton("Export Policy")
+        self.export_btn.clicked.connect(self.export_policy)
+        self.control_layout.addWidget(self.export_btn)
+
         # 決策紀錄
         self.decision_log = QTextEdit()
         self.decision_log.setReadOnly(True)
@@ -182,14 +210,26 @@ class TrackWindow(QWidget):
         if not path:
             return
 
-        # 呼叫 geometry.py 中的解析函式
-        start, start_tl, start_br, goal_tl, goal_br, border = parse_track_file(path)
-        self.start = start
-        self.goal_tl = goal_tl
-        self.goal_br = goal_br
-        self.draw_track(start, start_tl, start_br, goal_tl, goal_br, border)
+        # 讀檔並建立 Track（線段等衍生資料只算一次）
+        self.track = Track.from_file(path)
+        self.track_path = path  # 平行實驗的子 process 用路徑自己讀賽道
+        self.draw_track(self.track)
+
+    def export_policy(self):
+        # 把目前的 Q-table 存成 greedy policy 表（.policy.npy），給 policy.py 載入
+        if self.agent is None:
+            self.log_decision("⚠️ No trained agent to export.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Policy", "agent" + SUFFIX, f"Policy Files (*{SUFFIX})")
+        if not path:
+            return
+        if not path.endswith(SUFFIX):
+            path += SUFFIX
+
+        policy = GreedyPolicy.from_agent(self.agent, self.angle_choices, len(self.sensors))
+        self.log_decision(f"💾 Policy saved to {policy.save(path)}")
 
-    def draw_track(self, start, start_tl, start_br, goal_tl, goal_br, border_points):
+    def draw_track(self, track):
         # axis_pen = QPen(QColor("gray"))
         # axis_pen.setStyle(Qt.DashLine)  # 虛線更不干擾畫面
 
@@ -199,25 +239,26 @@ class TrackWindow(QWidget):
         # Y 軸：從上到下
         # self.scene.addLine(0, -1000, 0, 1000, axis_pen)
 
-        self.border_points = border_points
+        self.track = track
+        start = track.start
 
         self.scene.clear()
 
         # 畫邊界（黑線）
-        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in border_points])
+        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in track.border_points])
         self.scene.addPolygon(poly, QPen(QColor("white"), 1))
 
         # 畫起點（紅點）
         self.scene.addEllipse(start[0] * self.SCALE - 3, -start[1] * self.SCALE - 3, 6, 6, brush=QColor("red"))
 
         # 起點線
-        x1, y1 = start_tl
-        x2, y2 = start_br
+        x1, y1 = track.start_tl
+        x2, y2 = track.start_br
         self.scene.addLine(x1 * self.SCALE, -y1 * self.SCALE, x2 * self.SCALE, -y2 * self.SCALE, QPen(QColor("gray"), 1))
 
         # 畫終點（綠框）
-        x1, y1 = goal_tl
-        x2, y2 = goal_br
+        x1, y1 = track.goal_tl
+        x2, y2 = track.goal_br
         goal_poly = QPolygonF([
             QPointF(x1 * self.SCALE, -y1 * self.SCALE),
             QPointF(x2 * self.SCALE, -y1 * self.SCALE),
@@ -226,8 +267,12 @@ class TrackWindow(QWidget):
         ])
         self.scene.addPolygon(goal_poly, QPen(QColor("green"), 1, style=3))
 
+        # 建立環境，車子放在起點
+        self.env = CarEnv(track, sensors=self.sensors, angle_choices=self.angle_choices)
+        self.env.reset(x=start[0], theta=start[2])
+        self.car = self.env.car
+
         # 車子圓形
-        self.car = Car(start[0] * self.SCALE, start[1] * self.SCALE, theta=start[2])
         self.car_item = self.scene.addEllipse(self.car.x * self.SCALE - 3 * self.SCALE, -self.car.y * self.SCALE - 3 * self.SCALE, 6 * self.SCALE, 6 * self.SCALE, QPen(QColor("blue")))
         rad = math.radians(self.car.theta) # 90 -> pi/2
         x2 = self.car.x + math.cos(rad) * 1.0
@@ -241,19 +286,14 @@ class TrackWindow(QWidget):
             self.scene.removeItem(self.car_item)
         if self.car_dir_line:
             self.scene.removeItem(self.car_dir_line)
-        # theta = random.choice([90, 0, -45])
-        # theta = 90
-        # self.car = Car(self.start[0] * self.SCALE, self.start[1] * self.SCALE, theta=theta)
-        x_min = -3
-        x_max = 3
-        random_x = random.uniform(x_min, x_max)
-        # random_x = self.start[0]
-        theta = 90  # 或 random.choice([0, 45, 90, ...]) 如果你想也隨機角度
-
-        self.car = Car(random_x, self.start[1], theta=theta)
-        print("Reset car: " + str(random_x) + ", " + str(self.start[1]))
-
-        self.step_reward = 1
+        # 起點 x 在 -3 ~ 3 隨機、角度 90（env 裡設定）
+        # 訓練中就透過 trainer 重設，下一步才會從新的位置開始
+        if self.trainer:
+            self.trainer.reset()
+        else:
+            self.env.reset()
+        self.car = self.env.car
+        print("Reset car: " + str(self.car.x) + ", " + str(self.car.y))
 
         # 清除舊軌跡線
         if self.trajectory_item:
@@ -278,10 +318,10 @@ class TrackWindow(QWidget):
         self.car_theta_label.setText(f"θ: {self.car.theta:.1f}°")
 
         # 更新感測器資訊
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
+        sensor = self.car.get_sensor_distances(self.track)
         self.sensor_left_label.setText(f"Left: {sensor[0]:.2f}")
-        self.sensor_front_label.setText(f"Front: {sensor[1]:.2f}")
-        self.sensor_right_label.setText(f"Right: {sensor[2]:.2f}")
+        self.sensor_front_label.setText(f"Front: {sensor[len(sensor) // 2]:.2f}")
+        self.sensor_right_label.setText(f"Right: {sensor[-1]:.2f}")
 
         # 更新軌跡線（加入新座標點）
         x = self.car.x * self.SCALE
@@ -332,32 +372,27 @@ class TrackWindow(QWidget):
             lr=float(self.lr_input.text()),
             discount_factor=float(self.discounted_factor.text()),
             epsilon=float(self.eps_input.text()),
-            epsilon_decay=float(self.epsd_input.text())
+            epsilon_decay=float(self.epsd_input.text()),
+            trace_lambda=float(self.lambda_input.text())
         )
+        self.update_sensors()
+        self.trainer = QLearningTrainer(self.env, self.agent, max_steps=int(self.max_steps_input.text()))
         self.current_episode = 0
+        self.reset_car()
         interval = self.speed_slider.value()  # 單位是毫秒
         self.timer.start(interval)
 
+    def update_sensors(self):
+        self.sensors = SensorArray.evenly_spaced(int(self.sensor_beams_input.text()))
+        if self.env:
+            self.env.sensors = self.sensors
+        if self.car:
+            self.car.sensors = self.sensors
+
     def stop_training(self):
         self.timer.stop()
         self.log_decision("🛑 Training manually stopped.")
 
-    def get_reward(self):
-        x, y = self.car.x, self.car.y
-        radius = 3  # 車子半徑
-
-        gx1, gy1 = self.goal_tl
-        gx2, gy2 = self.goal_br
-        if gx1 <= x <= gx2 and gy2 <= y <= gy1:
-           return 1000, True
-
-        for x1, y1, x2, y2 in border_to_segments(self.border_points):
-            if is_circle_near_segment(x, y, radius, x1, y1, x2, y2):
-                return -100, True
-
-        self.step_reward *= 1
-        return self.step_reward, False
-
     def update_epoch(self, epoch):
         self.episode_label.setText(f"Epoch: {epoch}")
 
@@ -365,38 +400,21 @@ class TrackWindow(QWidget):
         self.decision_log.append(text)
 
     def train_step(self):
-        # 1. 取得state
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-        state = self.agent.get_state(sensor)
+        # 1~5. 取得state、選擇action、移動、計算reward、更新 Q-table（都在 trainer 裡）
+        state, action, reward, next_state, done = self.trainer.step()
 
-        # 2. 根據state 選擇action 並更新car 
-        action = self.agent.select_action(state)
-        # angle_choices = [-40, -20, 0, 20, 40]
-        # self.car.rotate(angle_choices[action])
-        self.car.move_forward(self.angle_choices[action])
-
-        # 3. 更新state
-        next_sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-        next_state = self.agent.get_state(next_sensor)
-
-        # 4. 計算reward
-        reward, done = self.get_reward()
-        self.total_reward += reward
-
-        # 5. 更新 Q-table
-        self.agent.update_q_table(state, action, reward, next_state)
-        
         # 6. 更新畫面
         self.log_decision(f"EP{self.current_episode} | S:{state} A:{action} R:{reward} -> S':{next_state}")
         self.update_car_graphics()
         
         # 7.
         if done:
-            self.reward_history.append(self.total_reward)  # 加入這次 episode 的 reward
-            self.total_reward = 0                          # 重設下一回合的 reward
-            self.step_count = 0
-            self.agent.decay_epsilon()
-            self.current_episode += 1
+            # reward 紀錄、epsilon 衰減都在 trainer 裡做完了
+            self.current_episode = self.trainer.current_episode
+            stats = self.trainer.stats
+            self.log_decision(f"📈 EP{self.current_episode} reward {self.trainer.reward_history[-1]:.0f} | "
+                              f"EMA {stats.ema:.1f} | avg(last {stats.last_n}) {stats.last_mean:.1f} | "
+                              f"min/max {stats.rolling_min:.0f}/{stats.rolling_max:.0f}")
             self.reset_car()
 
             if self.current_episode >= int(self.episode_label.text()):
@@ -405,6 +423,8 @@ class TrackWindow(QWidget):
                 self.run_test_episode()  # 加這行！
 
     def run_test_episode(self):
+        # 把 Q-table 凍結成 state -> 動作 的陣列，測試時每一步只查一次表
+        self.policy = GreedyPolicy.from_agent(self.agent, self.angle_choices, len(self.sensors))
         self.reset_car()
         self.is_testing = True
         self.test_timer = QTimer()
@@ -412,20 +432,17 @@ class TrackWindow(QWidget):
         self.test_timer.start(100)
 
     def test_step(self):
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-        state = self.agent.get_state(sensor)
+        sensor = self.env.observe()
 
         # 完全 greedy 選擇最優動作
-        q_values = self.agent.q_table.get(state, [0]*len(self.angle_choices))
-        action = q_values.index(max(q_values))
+        action = self.policy.action(sensor)
         # angle_choices = [-40, -20, 0, 20, 40]
 
         # self.car.rotate(angle_choices[action])
-        self.car.move_forward(self.angle_choices[action])
+        _, reward, done = self.env.step(action)
 
         self.update_car_graphics()
 
-        reward, done = self.get_reward()
         if done:
             self.test_timer.stop()
             self.is_testing = False
@@ -443,14 +460,12 @@ class TrackWindow(QWidget):
         plt.savefig(f"plot_{label}.png")  # 可選：儲存圖片
         plt.show()
 
-    def smooth(self, values, window=50):
-        return [sum(values[max(0, i-window):i+1]) / (i - max(0, i-window) + 1) for i in range(len(values))]
-
-    def plot_smoothed_curves(self, results_dict):
+    def plot_smoothed_curves(self, stats_dict):
+        # stats_dict: label -> RewardStats(window=SMOOTH_WINDOW)，移動平均已經算好，再平滑一次（TREND_WINDOW）
         plt.figure(figsize=(10, 5))
-        for label, rewards in results_dict.items():
-            smoothed_rewards = self.smooth(rewards, window=200)
-            plt.plot(self.smooth(smoothed_rewards), label=label)
+        for label, stats in stats_dict.items():
+            smoothed = RewardStats.from_rewards(stats.moving_averages, window=TREND_WINDOW)
+            plt.plot(smoothed.moving_averages, label=label)
         plt.xlabel("Episode")
         plt.ylabel("Smoothed Reward")
         plt.title("Reward Convergence Trend of Each Group (Moving Average)")
@@ -458,10 +473,10 @@ class TrackWindow(QWidget):
         plt.grid()
         plt.tight_layout()
         plt.savefig("smooth_reward_plot.png")
-        plt.show()
+        plt.show(block=False)  # 不要卡住 GUI 的 event loop
 
-    def plot_bar_avg_rewards(self, results_dict):
-        avg_rewards = {k: sum(v[-100:])/100 for k, v in results_dict.items()}
+    def plot_bar_avg_rewards(self, stats_dict):
+        avg_rewards = {k: stats.last_mean for k, stats in stats_dict.items()}
         plt.figure(figsize=(20, 10))
         plt.bar(avg_rewards.keys(), avg_rewards.values(), color="skyblue")
         plt.xlabel("Experiment Group")
@@ -470,71 +485,55 @@ class TrackWindow(QWidget):
         plt.grid(axis='y')
         plt.tight_layout()
         plt.savefig("bar_avg_rewards.png")
-        plt.show()
+        plt.show(block=False)
 
     def run_all_experiments(self):
-        baseline_config = {
-            "lr": 0.31,
-            "epsilon": 1.0,
-            "epsilon_decay": 0.995,
-            "discount_factor": 0.95
-        }
+        if self.track_path is None:
+            self.log_decision("⚠️ Import a track file first.")
+            return
+
+        # baseline 加上每次只改一個參數的組合，丟給 process pool 平行跑；lambda 跟其他欄位一樣從 GUI 讀
+        base = {**BASELINE_CONFIG, "trace_lambda": float(self.lambda_input.text())}
+        configs = one_at_a_time(
+            base,
+            # lr=[0.1, 0.5, 0.7],
+            epsilon_decay=[0.99, 0.97, 0.95],
+            # discount_factor=[0.5, 0.8, 0.97],
+        )
+        sweep = Sweep(
+            self.track_path, configs,
+            episodes=int(self.episode_label.text()),
+            results_path="sweep_results.jsonl",
+            sensor_beams=int(self.sensor_beams_input.text()),
+            max_steps=int(self.max_steps_input.text()),
+            plateau=(50, int(self.patience_input.text()), 1.0) if int(self.patience_input.text()) > 0 else None
+        )
+
+        stale = sweep.stale()
+        if stale:
+            self.log_decision(f"⚠️ Ignoring {stale} earlier results recorded with a different track or settings.")
+
+        # 每組結果只算一次統計量，log 和畫圖都用它
         results = {}
 
-        # 跑 baseline
-        self.set_agent_params(**baseline_config)
-        baseline_rewards = self.run_batch_training()
-        # results["baseline"] = baseline_rewards
-
-        experiments = {
-            # "lr": [0.1, 0.5, 0.7],
-            "epsilon_decay": [0.99, 0.97, 0.95],
-            # "discount_factor": [0.5, 0.8, 0.97]
-        }
-
-        for param, values in experiments.items():
-            for value in values:
-                config = baseline_config.copy()
-                config[param] = value
-                self.set_agent_params(**config)
-                rewards = self.run_batch_training()
-                label = f"{param}={value}"
-                results[label] = rewards
+        def on_result(config, seed, rewards, stop_reason):
+            label = self.experiment_label(config, base)
+            stats = results[label] = RewardStats.from_rewards(rewards, window=SMOOTH_WINDOW)
+            self.log_decision(f"✅ {label}: {stats.last_mean:.2f} "
+                              f"({len(stats)} episodes, {stop_reason})")
+            QApplication.processEvents()
+
+        for r in sweep.run(on_result):
+            label = self.experiment_label(r["config"], base)
+            if r["config"] in configs and label not in results:
+                results[label] = RewardStats.from_rewards(r["rewards"], window=SMOOTH_WINDOW)
+        results.pop("baseline", None)
 
         # 畫平滑曲線圖與平均柱狀圖
         self.plot_smoothed_curves(results)
         self.plot_bar_avg_rewards(results)
 
-    def run_batch_training(self):
-        self.agent.reset_q_table()
-        self.reset_car()
-        self.reward_history = []
-        self.total_reward = 0
-        self.current_episode = 0
-
-        for _ in range(int(self.episode_label.text())):
-            done = False
-            self.reset_car()
-            while not done:
-                sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-                state = self.agent.get_state(sensor)
-                action = self.agent.select_action(state)
-                # angle_choices = [-40, -20, 0, 20, 40]
-                self.car.move_forward(self.angle_choices[action])
-                next_sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-                next_state = self.agent.get_state(next_sensor)
-                reward, done = self.get_reward()
-                self.total_reward += reward
-                self.agent.update_q_table(state, action, reward, next_state)
-            self.reward_history.append(self.total_reward)
-            self.total_reward = 0
-            self.agent.decay_epsilon()
-        return self.reward_history.copy()
-
-    def set_agent_params(self, lr, epsilon, epsilon_decay, discount_factor):
-        self.agent = Agent(
-            lr=lr,
-            epsilon=epsilon,
-            epsilon_decay=epsilon_decay,
-            discount_factor=discount_factor
-        )
+    @staticmethod
+    def experiment_label(config, base=BASELINE_CONFIG):
+        changed = [f"{k}={v}" for k, v in config.items() if base.get(k) != v]
+        return ", ".join(changed) or "baseline"
@@ -0,0 +1,127 @@
+import argparse
+import random
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import CarEnv, BatchCarEnv
+from agent import Agent, DenseAgent, TileCodingAgent
+from tile_coding import TileCoder
+from sensors import SensorArray
+from trainer import QLearningTrainer, BatchQLearningTrainer, DynaQLearningTrainer, PlateauStopper
+from replay import ReplayBuffer
+from policy import GreedyPolicy
+from fuzzy import FuzzyController
+from warm_start import rollout_demonstrations, seed_q_table, seed_replay
+
+ANGLE_CHOICES = [-40, 0, 40]
+
+def main():
+    # 不開 GUI 直接訓練：python headless.py ../../軌道座標點.txt --episodes 300
+    parser = argparse.ArgumentParser(description="Headless Q-learning training (no display / Qt needed)")
+    parser.add_argument("track", help="track file (same format as the GUI import)")
+    parser.add_argument("--lr", type=float, default=0.4)
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--epsilon-decay", type=float, default=0.95)
+    parser.add_argument("--discount-factor", type=float, default=0.97)
+    parser.add_argument("--trace-lambda", type=float, default=0.0, help="Watkins Q(lambda); 0 is one-step Q-learning")
+    parser.add_argument("--episodes", type=int, default=300)
+    parser.add_argument("--max-steps", type=int, default=1000, help="per-episode step cap")
+    parser.add_argument("--patience", type=int, default=0,
+                        help="stop after this many episodes without improving the windowed mean reward (0: off)")
+    parser.add_argument("--plateau-window", type=int, default=50)
+    parser.add_argument("--min-delta", type=float, default=1.0)
+    parser.add_argument("--fast-forward", type=int, default=0, metavar="K",
+                        help="repeat each action up to K steps when far from walls (continuous collision, "
+                             "gamma^k discounting; 0: off)")
+    parser.add_argument("--sensor-beams", type=int, default=3)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    parser.add_argument("--q-table", choices=("dict", "dense", "tiles"), default="dict",
+                        help="dense: numpy array Q-table with integer state codes; tiles: hashed tile coding")
+    parser.add_argument("--tilings", type=int, default=8)
+    parser.add_argument("--tile-width", type=float, default=5)
+    parser.add_argument("--tile-memory", type=int, default=4096, help="size of the hashed weight array")
+    parser.add_argument("--num-envs", type=int, default=1,
+                        help="run this many cars in lockstep with a shared Q-table (implies --q-table dense)")
+    parser.add_argument("--planning-steps", type=int, default=0,
+                        help="replayed TD batches per real step (Dyna-style planning, implies --q-table dense)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--planning-lr", type=float, default=0.1)
+    parser.add_argument("--replay-size", type=int, default=50000)
+    parser.add_argument("--prioritized", action="store_true", help="sample replay by |TD error|")
+    parser.add_argument("--priority-beta", type=float, default=0.4,
+                        help="initial importance-sampling exponent for --prioritized (annealed to 1)")
+    parser.add_argument("--beta-steps", type=int, default=100000, help="replay batches over which beta reaches 1")
+    parser.add_argument("--warm-start", type=int, default=0, metavar="CARS",
+                        help="before training, seed the Q-table (and replay) from this many fuzzy-controller runs")
+    parser.add_argument("--warm-start-passes", type=int, default=3, help="backward sweeps over the demonstrations")
+    parser.add_argument("--export-policy", metavar="PATH",
+                        help="save the trained greedy policy table (.policy.npy) for policy.py")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    track = load_track(args.track, backend=args.backend)
+    sensors = SensorArray.evenly_spaced(args.sensor_beams)
+    agent_args = dict(
+        lr=args.lr,
+        discount_factor=args.discount_factor,
+        epsilon=args.epsilon,
+        epsilon_decay=args.epsilon_decay,
+        trace_lambda=args.trace_lambda
+    )
+    if args.fast_forward > 0 and (args.num_envs > 1 or args.planning_steps > 0):
+        parser.error("--fast-forward only supports the plain single-env trainer")
+    if args.warm_start > 0 and args.sensor_beams != 3:
+        parser.error("--warm-start needs the fuzzy controller's 3 sensors (right, front, left)")
+    if args.q_table == "tiles":
+        if args.num_envs > 1 or args.planning_steps > 0 or args.trace_lambda > 0:
+            parser.error("--q-table tiles only supports the plain single-env trainer")
+        if args.export_policy:
+            parser.error("--export-policy needs a table-based agent (--q-table dict or dense), not tiles")
+        agent_args.pop("trace_lambda")
+        coder = TileCoder(args.sensor_beams, args.tilings, args.tile_width, memory_size=args.tile_memory)
+        agent = TileCodingAgent(**agent_args, num_actions=len(ANGLE_CHOICES), coder=coder)
+    elif args.q_table == "dense" or args.num_envs > 1 or args.planning_steps > 0:
+        agent = DenseAgent(**agent_args, num_actions=len(ANGLE_CHOICES), num_sensors=args.sensor_beams,
+                           rng=np.random.default_rng(args.seed))
+    else:
+        agent = Agent(**agent_args)
+
+    stopper = PlateauStopper(args.plateau_window, args.patience, args.min_delta) if args.patience > 0 else None
+    if args.num_envs > 1:
+        env = BatchCarEnv(track, args.num_envs, ANGLE_CHOICES, sensors=sensors,
+                          rng=np.random.default_rng(args.seed))
+        trainer = BatchQLearningTrainer(env, agent, args.max_steps, stopper)
+    elif args.planning_steps > 0:
+        env = CarEnv(track, sensors=sensors, angle_choices=ANGLE_CHOICES)
+        buffer = ReplayBuffer(args.replay_size, prioritized=args.prioritized, beta=args.priority_beta,
+                              beta_steps=args.beta_steps, rng=np.random.default_rng(args.seed))
+        trainer = DynaQLearningTrainer(env, agent, buffer, args.planning_steps, args.batch_size, args.planning_lr,
+                                       args.max_steps, stopper)
+    else:
+        env = CarEnv(track, sensors=sensors, angle_choices=ANGLE_CHOICES, continuous=args.fast_forward > 0)
+        trainer = QLearningTrainer(env, agent, args.max_steps, stopper, args.fast_forward)
+
+    if args.warm_start > 0:
+        demo_env = BatchCarEnv(track, args.warm_start, ANGLE_CHOICES, sensors=sensors,
+                               rng=np.random.default_rng(args.seed))
+        log = rollout_demonstrations(demo_env, FuzzyController().decide_actions, args.max_steps)
+        seed_q_table(agent, log, args.warm_start_passes)
+        if isinstance(trainer, DynaQLearningTrainer):
+            seed_replay(trainer.buffer, agent, log)
+        goals = int(np.count_nonzero(log.rewards == demo_env.goal_reward))
+        print(f"Warm start: {len(log)} transitions from {args.warm_start} fuzzy runs ({goals} reached the goal)")
+
+    trainer.train(args.episodes)
+    stats = trainer.stats
+    print(f"Episodes: {len(stats)}  Average reward (last {min(len(stats), stats.last_n)}): {stats.last_mean:.2f}  "
+          f"Stopped: {trainer.stop_reason} ({trainer.truncated_episodes} episodes hit the step cap)")
+
+    if args.export_policy:
+        print(GreedyPolicy.from_agent(agent, ANGLE_CHOICES, args.sensor_beams).save(args.export_policy))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import io
+import os
+import random
+import multiprocessing
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import CarEnv
+from agent import DenseAgent
+from sensors import SensorArray
+from trainer import QLearningTrainer
+from reward_stats import RewardStats
+from policy import GreedyPolicy
+
+ANGLE_CHOICES = [-40, 0, 40]
+
+def hogwild_worker(shm_name, shape, counter, results, config, episodes, track_path, sensor_beams,
+                   backend, max_steps, seed):
+    """
+    子 process：自己的一台車，直接讀寫共用記憶體裡的 Q-table（不上鎖）
+    episode 編號從共用 counter 領，epsilon 照編號算，所以全部 worker 合起來的 epsilon 排程跟單一 process 一樣
+    """
+    random.seed(seed)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        track = load_track(track_path, backend=backend)
+        env = CarEnv(track, sensors=SensorArray.evenly_spaced(sensor_beams), angle_choices=ANGLE_CHOICES)
+        agent = DenseAgent(**config, num_actions=len(ANGLE_CHOICES), num_sensors=sensor_beams)
+        agent.q_table = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        trainer = QLearningTrainer(env, agent, max_steps)
+
+        rewards = []
+        while True:
+            # 只有領 episode 編號時用到鎖，一個 episode 一次；Q-table 的更新完全不上鎖
+            with counter.get_lock():
+                index = counter.value
+                if index >= episodes:
+                    break
+                counter.value += 1
+            agent.epsilon = max(agent.min_epsilon, config["epsilon"] * config["epsilon_decay"] ** index)
+            with redirect_stdout(io.StringIO()):
+                rewards.append((index, trainer.run_episode()))
+        results.put(rewards)
+    except BaseException:
+        results.put(None)  # 讓主 process 知道這個 worker 掛了，不要一直等
+        raise
+    finally:
+        # 先把 numpy view 放掉才能 close
+        agent = trainer = None
+        shm.close()
+
+def train_hogwild(track_path, config, episodes=300, workers=None, seed=None, sensor_beams=3,
+                  backend="brute", max_steps=1000):
+    """
+    Hogwild 式的非同步 Q-learning：workers 個 process 各自開車，共用同一張 DenseAgent 格式的 Q-table
+    :param config: Agent 的參數（lr, discount_factor, epsilon, epsilon_decay, 可選 min_epsilon）
+    :return: (訓練好的 DenseAgent, 依 episode 編號排序的 reward 清單)
+    """
+    workers = workers or os.cpu_count() or 1
+    load_track(track_path, backend=backend)  # 先轉好二進位賽道，避免 worker 同時轉
+    template = DenseAgent(**config, num_actions=len(ANGLE_CHOICES), num_sensors=sensor_beams)
+    shape = template.q_table.shape
+
+    context = multiprocessing.get_context("spawn")
+    shm = shared_memory.SharedMemory(create=True, size=template.q_table.nbytes)
+    q_table = None
+    try:
+        q_table = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        q_table[:] = 0
+        counter = context.Value("q", 0)
+        results = context.Queue()
+        base_seed = seed if seed is not None else random.randrange(2 ** 31)
+        processes = [
+            context.Process(target=hogwild_worker, args=(
+                shm.name, shape, counter, results, config, episodes, os.path.abspath(track_path),
+                sensor_beams, backend, max_steps, base_seed + i
+            ))
+            for i in range(workers)
+        ]
+        for p in processes:
+            p.start()
+        # 先收結果再 join，避免 queue 滿了卡住子 process
+        collected = []
+        for _ in processes:
+            rewards = results.get()
+            if rewards is None:
+                for p in processes:
+                    p.terminate()
+                raise RuntimeError("a hogwild worker failed (see its traceback above)")
+            collected.extend(rewards)
+        for p in processes:
+            p.join()
+
+        template.q_table = q_table.copy()
+    finally:
+        # close() 時如果還有 numpy view 指著 shm.buf 會丟 BufferError，蓋掉原本的例外又跳過 unlink
+        del q_table
+        try:
+            shm.close()
+        finally:
+            shm.unlink()
+
+    collected.sort()
+    template.epsilon = max(template.min_epsilon, config["epsilon"] * config["epsilon_decay"] ** episodes)
+    return template, [reward for _, reward in collected]
+
+def main():
+    # python hogwild.py ../../軌道座標點.txt --workers 8 --episodes 300
+    parser = argparse.ArgumentParser(description="Hogwild shared-memory Q-learning across processes")
+    parser.add_argument("track", help="track file (same format as the GUI import)")
+    parser.add_argument("--lr", type=float, default=0.4)
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--epsilon-decay", type=float, default=0.95)
+    parser.add_argument("--discount-factor", type=float, default=0.97)
+    parser.add_argument("--episodes", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sensor-beams", type=int, default=3)
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    parser.add_argument("--export-policy", metavar="PATH", help="save the greedy policy table (.policy.npy)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = dict(lr=args.lr, discount_factor=args.discount_factor,
+                  epsilon=args.epsilon, epsilon_decay=args.epsilon_decay)
+    agent, rewards = train_hogwild(args.track, config, args.episodes, args.workers, args.seed,
+                                   args.sensor_beams, args.backend, args.max_steps)
+    stats = RewardStats.from_rewards(rewards)
+    print(f"Episodes: {len(stats)}  Average reward (last {min(len(stats), stats.last_n)}): {stats.last_mean:.2f}")
+
+    if args.export_policy:
+        print(GreedyPolicy.from_agent(agent, ANGLE_CHOICES).save(args.export_policy))
+
+if __name__ == "__main__":
+    main()
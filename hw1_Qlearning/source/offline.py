@@ -0,0 +1,211 @@
+import argparse
+import random
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import CarEnv
+from agent import DenseAgent
+from sensors import SensorArray
+from policy import GreedyPolicy, evaluate
+from fuzzy import FuzzyController
+
+ANGLE_CHOICES = [-40, 0, 40]
+
+class TransitionLog:
+    """
+    離線資料集：每筆 transition 存 (sensor, action, reward, next_sensor, done)
+    存原始感測器距離而不是 state，之後換不同的 bin 設定也能重用同一份資料
+    """
+    def __init__(self, sensors, actions, rewards, next_sensors, dones, angle_choices):
+        self.sensors = np.asarray(sensors, dtype=float)
+        self.actions = np.asarray(actions, dtype=np.int64)
+        self.rewards = np.asarray(rewards, dtype=float)
+        self.next_sensors = np.asarray(next_sensors, dtype=float)
+        self.dones = np.asarray(dones, dtype=bool)
+        self.angle_choices = np.asarray(angle_choices, dtype=float)
+
+    def __len__(self):
+        return len(self.actions)
+
+    @classmethod
+    def concatenate(cls, logs):
+        # 把不同 controller 收集的資料合在一起
+        return cls(
+            np.concatenate([log.sensors for log in logs]),
+            np.concatenate([log.actions for log in logs]),
+            np.concatenate([log.rewards for log in logs]),
+            np.concatenate([log.next_sensors for log in logs]),
+            np.concatenate([log.dones for log in logs]),
+            logs[0].angle_choices
+        )
+
+    def save(self, path):
+        np.savez(path, sensors=self.sensors, actions=self.actions, rewards=self.rewards,
+                 next_sensors=self.next_sensors, dones=self.dones, angle_choices=self.angle_choices)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["sensors"], data["actions"], data["rewards"], data["next_sensors"], data["dones"],
+                   data["angle_choices"])
+
+def collect(env, controller, episodes, max_steps=1000):
+    """
+    用任意 controller 開車並記錄 transition（env 要是有 angle_choices 的 CarEnv）
+    :param controller: controller(sensor) -> 動作索引
+    """
+    sensors, actions, rewards, next_sensors, dones = [], [], [], [], []
+    for _ in range(episodes):
+        sensor = env.reset()
+        for _ in range(max_steps):
+            action = controller(sensor)
+            next_sensor, reward, done = env.step(action)
+            sensors.append(sensor)
+            actions.append(action)
+            rewards.append(reward)
+            next_sensors.append(next_sensor)
+            dones.append(done)
+            sensor = next_sensor
+            if done:
+                break
+    return TransitionLog(sensors, actions, rewards, next_sensors, dones, env.angle_choices)
+
+def random_controller(num_actions):
+    return lambda sensor: random.randrange(num_actions)
+
+def agent_controller(agent):
+    # 照 agent 目前的 epsilon-greedy 開車（不更新 Q-table）
+    return lambda sensor: agent.select_action(agent.get_state(sensor))
+
+def snap_angles(angles, angle_choices):
+    """
+    連續的方向盤角度 -> 最接近的 angle_choices 索引（可以是單一數值或陣列）
+    距離一樣時選轉比較大的那個（例如 [-40, 0, 40] 時 20 -> 40、-20 -> -40），左右轉才會對稱
+    """
+    choices = np.asarray(angle_choices, dtype=float)
+    distance = np.abs(np.asarray(angles, dtype=float)[..., None] - choices)
+    return np.argmin(distance - 1e-9 * np.abs(choices), axis=-1)
+
+def steering_controller(decide, angle_choices):
+    # 輸出連續方向盤角度的 controller（例如模糊控制）轉成最接近的離散動作
+    return lambda sensor: int(snap_angles(decide(sensor), angle_choices))
+
+def fitted_q_iteration(log, discount_factor, num_bins=6, bin_width=5, iterations=1000, tol=1e-6, min_count=1):
+    """
+    Tabular fitted Q-iteration：整份資料一起做 Bellman backup，直到 Q 不再變動
+    Q(s, a) <- 所有 (s, a) 的 transition 的 r + gamma * (1 - done) * max_a' Q(s', a') 平均
+    max 只看資料裡出現至少 min_count 次的 (s', a')：樣本太少的動作估計很不準，拿來 bootstrap 會高估
+    沒有資料的 (s, a) 最後設成比資料裡最差的值再低一點，greedy 時不會選到
+    :return: (DenseAgent（epsilon = 0）, 實際跑的迭代次數, 是否在 iterations 次內收斂到 tol)
+    """
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1")
+    num_actions = len(log.angle_choices)
+    agent = DenseAgent(lr=1.0, discount_factor=discount_factor, epsilon=0.0, epsilon_decay=1.0, min_epsilon=0.0,
+                       num_actions=num_actions, num_sensors=log.sensors.shape[1],
+                       num_bins=num_bins, bin_width=bin_width)
+    states = agent.encode_states(log.sensors)
+    next_states = agent.encode_states(log.next_sensors)
+    cells = states * num_actions + log.actions
+    size = agent.num_states * num_actions
+
+    counts = np.bincount(cells, minlength=size)
+    supported = counts >= max(min_count, 1)
+    reward_sums = np.bincount(cells, weights=log.rewards, minlength=size)
+    not_done = ~log.dones
+
+    q = np.zeros(size)
+    converged = False
+    for iteration in range(1, iterations + 1):
+        # 完全沒有可用動作的 next state（資料的盡頭）當作 0
+        masked = np.where(supported, q, -np.inf).reshape(-1, num_actions)
+        state_values = masked.max(axis=1)
+        state_values[np.isneginf(state_values)] = 0.0
+
+        next_values = state_values[next_states] * not_done
+        targets = reward_sums + discount_factor * np.bincount(cells, weights=next_values, minlength=size)
+        new_q = np.where(supported, targets / np.maximum(counts, 1), 0.0)
+        change = np.max(np.abs(new_q - q))
+        q = new_q
+        if change < tol:
+            converged = True
+            break
+
+    if supported.any():
+        q[~supported] = q[supported].min() - 1.0
+    agent.q_table = q.reshape(agent.num_states, num_actions)
+    return agent, iteration, converged
+
+def main():
+    # python offline.py collect ../../軌道座標點.txt --controller random --episodes 500 --out random.npz
+    # python offline.py collect ../../軌道座標點.txt --controller fuzzy --episodes 50 --out fuzzy.npz
+    # python offline.py fit random.npz --track ../../軌道座標點.txt --export-policy offline.policy.npy
+    parser = argparse.ArgumentParser(description="Offline Q-learning: collect transition logs, then fit Q from them")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("collect", help="drive a controller and save its transitions")
+    p.add_argument("track")
+    p.add_argument("--controller", choices=("random", "policy", "fuzzy"), default="random")
+    p.add_argument("--policy", help="policy file (.policy.npy) for --controller policy")
+    p.add_argument("--epsilon", type=float, default=0.1,
+                   help="random action rate on top of --controller policy / fuzzy")
+    p.add_argument("--episodes", type=int, default=500)
+    p.add_argument("--max-steps", type=int, default=1000)
+    p.add_argument("--sensor-beams", type=int, default=3)
+    p.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                   help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--out", required=True)
+
+    p = sub.add_parser("fit", help="fitted Q-iteration over one or more saved logs")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--discount-factor", type=float, default=0.97)
+    p.add_argument("--iterations", type=int, default=1000, help="upper bound on Bellman sweeps (at least 1)")
+    p.add_argument("--min-count", type=int, default=1, help="ignore (state, action) pairs seen fewer times")
+    p.add_argument("--track", help="evaluate the fitted greedy policy on this track")
+    p.add_argument("--export-policy", metavar="PATH")
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        if args.controller == "policy" and not args.policy:
+            parser.error("--controller policy needs --policy")
+        if args.controller == "fuzzy" and args.sensor_beams != 3:
+            parser.error("--controller fuzzy needs the fuzzy controller's 3 sensors (right, front, left)")
+        if args.seed is not None:
+            random.seed(args.seed)
+        track = load_track(args.track, backend=args.backend)
+        env = CarEnv(track, sensors=SensorArray.evenly_spaced(args.sensor_beams), angle_choices=ANGLE_CHOICES)
+        if args.controller in ("policy", "fuzzy"):
+            if args.controller == "policy":
+                act = GreedyPolicy.load(args.policy).action
+            else:
+                act = steering_controller(FuzzyController().decide_action, ANGLE_CHOICES)
+            explore = random_controller(len(ANGLE_CHOICES))
+            controller = lambda sensor: explore(sensor) if random.random() < args.epsilon else act(sensor)
+        else:
+            controller = random_controller(len(ANGLE_CHOICES))
+        log = collect(env, controller, args.episodes, args.max_steps)
+        print(f"{len(log)} transitions -> {log.save(args.out)}")
+        return
+
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    log = TransitionLog.concatenate([TransitionLog.load(path) for path in args.logs])
+    agent, iterations, converged = fitted_q_iteration(log, args.discount_factor, iterations=args.iterations,
+                                                      min_count=args.min_count)
+    if converged:
+        print(f"{len(log)} transitions, converged after {iterations} iterations")
+    else:
+        print(f"{len(log)} transitions, stopped at iteration cap ({iterations}) before converging")
+
+    policy = GreedyPolicy.from_agent(agent, log.angle_choices)
+    if args.export_policy:
+        print(policy.save(args.export_policy))
+    if args.track:
+        track = load_track(args.track)
+        _, _, reached_goal = evaluate(policy, track, np.linspace(-3, 3, 21))
+        print(f"Goal reached from {reached_goal.sum()} / 21 starts")
+
+if __name__ == "__main__":
+    main()
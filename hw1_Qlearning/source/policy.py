@@ -0,0 +1,144 @@
+import argparse
+import os
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import BatchCarEnv
+from sensors import SensorArray
+
+# 凍結的 greedy policy 二進位格式：一個 int16 的 .npy 陣列，可以 memory-map
+#   [0:6]          header：MAGIC, VERSION, 感測器數 S, 每個感測器的 bin 數 B, bin 寬度, 動作數 A
+#   [6:6+A]        每個動作的方向盤角度（度）
+#   [6+A:6+A+B**S] 每個 state code 的動作索引
+MAGIC = 0x5150
+VERSION = 1
+HEADER_SIZE = 6
+SUFFIX = ".policy.npy"
+
+class GreedyPolicy:
+    """
+    訓練好的 Q-table 轉成「state code -> 動作」的陣列，之後推論不需要 Agent
+    state code 的算法跟 DenseAgent 一樣（每個感測器 min(s // bin_width, num_bins - 1) 當成 num_bins 進位數字）
+    每一步只要算 state code 再查一次陣列
+    """
+    def __init__(self, actions, angle_choices, num_sensors=3, num_bins=6, bin_width=5):
+        self.actions = np.asarray(actions)
+        self.angle_choices = np.asarray(angle_choices)
+        self.num_sensors = num_sensors
+        self.num_bins = num_bins
+        self.bin_width = bin_width
+        self.place_values = num_bins ** np.arange(num_sensors - 1, -1, -1)
+        if len(self.actions) != num_bins ** num_sensors:
+            raise ValueError("policy table size does not match num_bins ** num_sensors")
+
+    @classmethod
+    def from_agent(cls, agent, angle_choices, num_sensors=None):
+        """
+        Agent（dict Q-table）或 DenseAgent -> GreedyPolicy
+        沒看過的 state 跟 test_step 一樣當成 Q 全為 0，選第一個動作
+        """
+        if isinstance(agent.q_table, dict):
+            if num_sensors is None:
+                num_sensors = len(next(iter(agent.q_table))) if agent.q_table else 3
+            num_bins, bin_width = 6, 5   # Agent.get_state 寫死的 bin
+            actions = np.zeros(num_bins ** num_sensors, dtype=np.int16)
+            for state, q_values in agent.q_table.items():
+                code = 0
+                for b in state:
+                    code = code * num_bins + b
+                actions[code] = int(np.argmax(q_values))
+            return cls(actions, angle_choices, num_sensors, num_bins, bin_width)
+
+        if getattr(agent, "q_table", None) is None or agent.q_table.ndim != 2 or not hasattr(agent, "place_values"):
+            raise ValueError("only Agent and DenseAgent Q-tables can be compiled into a policy table")
+        actions = np.argmax(agent.q_table, axis=1).astype(np.int16)
+        return cls(actions, angle_choices, agent.num_sensors, agent.num_bins, agent.bin_width)
+
+    def encode(self, sensor_values):
+        code = 0
+        for s in sensor_values:
+            code = code * self.num_bins + int(min(s // self.bin_width, self.num_bins - 1))
+        return code
+
+    def action(self, sensor_values):
+        return int(self.actions[self.encode(sensor_values)])
+
+    def action_batch(self, sensor_values):
+        # (N, num_sensors) -> (N,) 的動作索引
+        bins = np.minimum(np.asarray(sensor_values, dtype=float) // self.bin_width, self.num_bins - 1).astype(np.int64)
+        return self.actions[bins @ self.place_values]
+
+    def save(self, path):
+        if float(self.bin_width) != int(self.bin_width) or np.any(self.angle_choices != np.round(self.angle_choices)):
+            raise ValueError("binary policy format needs an integer bin width and integer steering angles")
+        header = [MAGIC, VERSION, self.num_sensors, self.num_bins, int(self.bin_width), len(self.angle_choices)]
+        data = np.concatenate([header, np.round(self.angle_choices), self.actions]).astype(np.int16)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        data = np.load(path, mmap_mode='r' if mmap else None)
+        if data.ndim != 1 or len(data) < HEADER_SIZE or data[0] != MAGIC:
+            raise ValueError(f"Not a policy file: {path}")
+        if data[1] != VERSION:
+            raise ValueError(f"Unsupported policy version {data[1]} in {path}")
+
+        num_sensors, num_bins, bin_width, num_actions = (int(v) for v in data[2:HEADER_SIZE])
+        angle_choices = np.array(data[HEADER_SIZE:HEADER_SIZE + num_actions], dtype=float)
+        actions = data[HEADER_SIZE + num_actions:]
+        return cls(actions, angle_choices, num_sensors, num_bins, bin_width)
+
+def evaluate(policy, track, start_xs, max_steps=1000, start_theta=90):
+    """
+    從很多個起點 x 同時跑 greedy policy（BatchCarEnv，每步一次向量化查表）
+    :return: (total_rewards, steps, reached_goal)，每個都是長度 len(start_xs) 的陣列
+    """
+    start_xs = np.asarray(start_xs, dtype=float)
+    n = len(start_xs)
+    env = BatchCarEnv(track, n, policy.angle_choices, sensors=SensorArray.evenly_spaced(policy.num_sensors),
+                      start_theta=start_theta)
+    env.reset()
+    env.cars.reset(slice(None), start_xs, track.start[1], start_theta)
+    sensors = env.observe()
+
+    totals = np.zeros(n)
+    steps = np.zeros(n, dtype=np.int64)
+    reached_goal = np.zeros(n, dtype=bool)
+    running = np.ones(n, dtype=bool)
+    for _ in range(max_steps):
+        sensors, rewards, dones = env.step(policy.action_batch(sensors))
+        totals[running] += rewards[running]
+        steps[running] += 1
+        reached_goal |= running & dones & (rewards == env.goal_reward)
+        running &= ~dones
+        if not running.any():
+            break
+    return totals, steps, reached_goal
+
+def main():
+    # python policy.py agent.policy.npy ../../軌道座標點.txt --starts 21
+    parser = argparse.ArgumentParser(description="Evaluate a frozen greedy policy from many start positions")
+    parser.add_argument("policy", help=f"policy file ({SUFFIX})")
+    parser.add_argument("track", help="track file")
+    parser.add_argument("--starts", type=int, default=21, help="number of evenly spaced start x positions")
+    parser.add_argument("--start-x-range", type=float, nargs=2, default=(-3, 3))
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    args = parser.parse_args()
+
+    policy = GreedyPolicy.load(args.policy)
+    track = load_track(args.track, backend=args.backend)
+    start_xs = np.linspace(*args.start_x_range, args.starts)
+    totals, steps, reached_goal = evaluate(policy, track, start_xs, args.max_steps)
+    for x, total, n, goal in zip(start_xs, totals, steps, reached_goal):
+        print(f"x={x:+.2f}  reward={total:.0f}  steps={n}  {'goal' if goal else 'fail'}")
+    print(f"Goal reached from {reached_goal.sum()} / {len(start_xs)} starts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+
+class ReplayBuffer:
+    """
+    預先配置好的環形 replay memory，存 (state, action, reward, next_state, done)
+    state 是 DenseAgent 的整數 state code，每個欄位各是一個長度 capacity 的陣列，滿了就覆蓋最舊的
+    prioritized=True 時依 |TD error| ** alpha 的比例抽樣，新加入的 transition 先給目前最大的 priority
+    照 priority 抽樣會偏向 TD error 大的 transition，更新時要乘上 importance-sampling 權重 (N * P(i)) ** -beta
+    修正回來；beta 從 beta 開始，sample() 呼叫 beta_steps 次後線性增加到 1（訓練後期完全修正偏差）
+    """
+    def __init__(self, capacity, prioritized=False, alpha=0.6, beta=0.4, beta_steps=100000, rng=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta_start = beta
+        self.beta_steps = beta_steps
+        self.sample_calls = 0
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity)
+
+        self.position = 0   # 下一筆要寫入的位置
+        self.size = 0
+        self.max_priority = 1.0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def beta(self):
+        progress = min(1.0, self.sample_calls / self.beta_steps) if self.beta_steps > 0 else 1.0
+        return self.beta_start + (1.0 - self.beta_start) * progress
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.priorities[i] = self.max_priority
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        # 一次寫入很多筆（例如 BatchQLearningTrainer 一步的 K 筆），超過 capacity 時只留最後的
+        states = np.asarray(states, dtype=np.int64).reshape(-1)
+        count = len(states)
+        keep = slice(max(0, count - self.capacity), count)
+        idx = (self.position + np.arange(count)[keep]) % self.capacity
+
+        self.states[idx] = states[keep]
+        self.actions[idx] = np.asarray(actions).reshape(-1)[keep]
+        self.rewards[idx] = np.asarray(rewards).reshape(-1)[keep]
+        self.next_states[idx] = np.asarray(next_states).reshape(-1)[keep]
+        self.dones[idx] = np.asarray(dones).reshape(-1)[keep]
+        self.priorities[idx] = self.max_priority
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        """
+        抽 batch_size 筆（可重複）
+        :return: (indices, states, actions, rewards, next_states, dones)
+        """
+        if self.size == 0:
+            raise ValueError("cannot sample from an empty replay buffer")
+        self.sample_calls += 1
+        if self.prioritized:
+            p = self.priorities[:self.size] ** self.alpha
+            idx = self.rng.choice(self.size, batch_size, p=p / p.sum())
+        else:
+            idx = self.rng.integers(0, self.size, batch_size)
+        return idx, self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
+
+    def importance_weights(self, indices):
+        """
+        剛抽到的 indices 的 importance-sampling 權重 (N * P(i)) ** -beta，除以這批的最大值讓權重不超過 1
+        uniform 抽樣時每筆都是 1
+        """
+        if not self.prioritized:
+            return np.ones(len(indices))
+        p = self.priorities[:self.size] ** self.alpha
+        probabilities = p[indices] / p.sum()
+        weights = (self.size * probabilities) ** -self.beta
+        return weights / weights.max()
+
+    def update_priorities(self, indices, td_errors, eps=1e-3):
+        # eps 讓 TD error 為 0 的 transition 還是有機會被抽到
+        priorities = np.abs(np.asarray(td_errors, dtype=float)) + eps
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, float(priorities.max()))
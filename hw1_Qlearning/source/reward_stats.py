@@ -0,0 +1,103 @@
+from collections import deque
+
+class RewardStats:
+    """
+    每個 episode 的 reward 進來時 O(1) 更新的統計量：
+    最近 window 個的移動平均、EMA、最近 window 個的最小 / 最大值、最近 last_n 個的平均
+    每一步的移動平均、EMA 都存成序列，畫圖時直接拿來用，不用再從頭重算
+    """
+    def __init__(self, window=50, ema_alpha=0.1, last_n=100):
+        self.window = window
+        self.ema_alpha = ema_alpha
+        self.last_n = last_n
+
+        self.count = 0
+        self.total = 0.0
+        self.ema = None
+        self.moving_averages = []
+        self.emas = []
+
+        self._window_values = deque()
+        self._window_sum = 0.0
+        self._last_values = deque()
+        self._last_sum = 0.0
+        # 單調佇列：(index, value)，隊首就是目前視窗內的最小 / 最大值
+        self._min_queue = deque()
+        self._max_queue = deque()
+
+    @classmethod
+    def from_rewards(cls, rewards, window=50, ema_alpha=0.1, last_n=100):
+        stats = cls(window, ema_alpha, last_n)
+        stats.extend(rewards)
+        return stats
+
+    def extend(self, rewards):
+        for r in rewards:
+            self.update(r)
+
+    def update(self, reward):
+        reward = float(reward)
+        i = self.count
+        self.count += 1
+        self.total += reward
+
+        self._window_values.append(reward)
+        self._window_sum += reward
+        if len(self._window_values) > self.window:
+            self._window_sum -= self._window_values.popleft()
+
+        self._last_values.append(reward)
+        self._last_sum += reward
+        if len(self._last_values) > self.last_n:
+            self._last_sum -= self._last_values.popleft()
+
+        while self._min_queue and self._min_queue[-1][1] >= reward:
+            self._min_queue.pop()
+        self._min_queue.append((i, reward))
+        while self._max_queue and self._max_queue[-1][1] <= reward:
+            self._max_queue.pop()
+        self._max_queue.append((i, reward))
+        oldest = i - self.window + 1
+        if self._min_queue[0][0] < oldest:
+            self._min_queue.popleft()
+        if self._max_queue[0][0] < oldest:
+            self._max_queue.popleft()
+
+        self.ema = reward if self.ema is None else self.ema + self.ema_alpha * (reward - self.ema)
+        self.moving_averages.append(self.moving_average)
+        self.emas.append(self.ema)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def moving_average(self):
+        return self._window_sum / len(self._window_values) if self._window_values else 0.0
+
+    @property
+    def rolling_min(self):
+        return self._min_queue[0][1] if self._min_queue else 0.0
+
+    @property
+    def rolling_max(self):
+        return self._max_queue[0][1] if self._max_queue else 0.0
+
+    @property
+    def last_mean(self):
+        # 最近 last_n 個 episode 的平均（原本 plot_bar_avg_rewards 的 sum(v[-100:]) / 100）
+        return self._last_sum / len(self._last_values) if self._last_values else 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return {
+            "episodes": self.count,
+            "mean": self.mean,
+            "moving_average": self.moving_average,
+            "ema": self.ema,
+            "rolling_min": self.rolling_min,
+            "rolling_max": self.rolling_max,
+            "last_mean": self.last_mean,
+        }
@@ -0,0 +1,149 @@
+import math
+import numpy as np
+from geometry import ray_distances, is_circle_near_segment
+
+class UniformGrid:
+    """
+    賽道線段的均勻網格索引
+    每個格子記錄跟它 bounding box 有重疊的線段，射線只檢查走過的格子，圓形碰撞只檢查附近的格子
+    算距離 / 碰撞用的公式跟暴力法完全一樣，所以結果會一致
+    """
+    EPS = 1e-9
+
+    def __init__(self, segment_array, cell_size=None):
+        segments = np.asarray(segment_array, dtype=float).reshape(-1, 4)
+        self.segment_array = segments
+
+        if len(segments):
+            xmin = float(min(segments[:, 0].min(), segments[:, 2].min()))
+            ymin = float(min(segments[:, 1].min(), segments[:, 3].min()))
+            xmax = float(max(segments[:, 0].max(), segments[:, 2].max()))
+            ymax = float(max(segments[:, 1].max(), segments[:, 3].max()))
+        else:
+            xmin = ymin = xmax = ymax = 0.0
+
+        # 沒指定格子大小：取平均線段長度，跟「每格大約放幾條線段」的大小比較大的那個
+        # 格子太小的話射線要走很多空格子，Python 迴圈反而變慢
+        if cell_size is None:
+            lengths = np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1])
+            lengths = lengths[lengths > 0]
+            area = (xmax - xmin) * (ymax - ymin)
+            cell_size = max(
+                float(lengths.mean()) if len(lengths) else 1.0,
+                2 * math.sqrt(area / max(len(segments), 1)),
+            )
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+
+        self.cell_size = cell_size
+        self.origin = (xmin, ymin)
+        self.nx = max(1, int(math.ceil((xmax - xmin) / cell_size)))
+        self.ny = max(1, int(math.ceil((ymax - ymin) / cell_size)))
+
+        # 把每條線段放進它 bounding box 蓋到的格子（稍微放大一點避免浮點誤差漏掉）
+        cells = [[] for _ in range(self.nx * self.ny)]
+        for k, (x1, y1, x2, y2) in enumerate(segments):
+            i0, j0 = self.cell_of(min(x1, x2) - self.EPS, min(y1, y2) - self.EPS)
+            i1, j1 = self.cell_of(max(x1, x2) + self.EPS, max(y1, y2) + self.EPS)
+            for j in range(j0, j1 + 1):
+                for i in range(i0, i1 + 1):
+                    cells[j * self.nx + i].append(k)
+
+        # 用 CSR 格式存：第 c 格的線段是 cell_items[cell_start[c]:cell_start[c + 1]]
+        counts = np.array([len(c) for c in cells], dtype=np.int64)
+        self.cell_start = np.concatenate([[0], np.cumsum(counts)])
+        self.cell_items = np.array([k for c in cells for k in c], dtype=np.int64)
+
+    def cell_of(self, x, y):
+        # 座標 -> 格子索引（超出範圍的夾到邊界）
+        i = int((x - self.origin[0]) // self.cell_size)
+        j = int((y - self.origin[1]) // self.cell_size)
+        return min(max(i, 0), self.nx - 1), min(max(j, 0), self.ny - 1)
+
+    def cell_segments(self, i, j):
+        c = j * self.nx + i
+        return self.cell_items[self.cell_start[c]:self.cell_start[c + 1]]
+
+    def query_box(self, xmin, ymin, xmax, ymax):
+        # 回傳跟矩形範圍有重疊的格子內所有線段索引（由小到大、不重複）
+        i0, j0 = self.cell_of(xmin, ymin)
+        i1, j1 = self.cell_of(xmax, ymax)
+        found = [self.cell_segments(i, j) for j in range(j0, j1 + 1) for i in range(i0, i1 + 1)]
+        if not found:
+            return self.cell_items[:0]
+        return np.unique(np.concatenate(found))
+
+    def cast_rays(self, xs, ys, angles_deg, max_distance=1000):
+        xs, ys, angles_deg = np.broadcast_arrays(
+            np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), np.asarray(angles_deg, dtype=float)
+        )
+        # 方向向量跟 cast_rays 一樣一次算，確保每條射線的數值完全相同
+        rad = np.radians(angles_deg)
+        dxs = np.cos(rad)
+        dys = np.sin(rad)
+
+        result = np.empty(xs.shape)
+        for idx in np.ndindex(xs.shape):
+            result[idx] = self._cast_one(xs[idx], ys[idx], dxs[idx], dys[idx], max_distance)
+        return result
+
+    def _cast_one(self, x, y, dx, dy, max_distance):
+        gx0, gy0 = self.origin
+        cs = self.cell_size
+        gx1 = gx0 + self.nx * cs
+        gy1 = gy0 + self.ny * cs
+
+        # 先用 slab 法算出射線在網格範圍內的區間 [t_enter, t_leave]
+        t_enter, t_leave = 0.0, float(max_distance)
+        for o, d, lo, hi in ((x, dx, gx0, gx1), (y, dy, gy0, gy1)):
+            if d == 0:
+                if o < lo or o > hi:
+                    return float(max_distance)
+            else:
+                ta = (lo - o) / d
+                tb = (hi - o) / d
+                t_enter = max(t_enter, min(ta, tb))
+                t_leave = min(t_leave, max(ta, tb))
+        if t_enter > t_leave:
+            return float(max_distance)
+
+        # DDA（Amanatides & Woo）沿射線一格一格走
+        i, j = self.cell_of(x + dx * t_enter, y + dy * t_enter)
+        step_i = 1 if dx > 0 else -1
+        step_j = 1 if dy > 0 else -1
+        t_max_x = (gx0 + (i + (dx > 0)) * cs - x) / dx if dx != 0 else math.inf
+        t_max_y = (gy0 + (j + (dy > 0)) * cs - y) / dy if dy != 0 else math.inf
+        t_delta_x = cs / abs(dx) if dx != 0 else math.inf
+        t_delta_y = cs / abs(dy) if dy != 0 else math.inf
+
+        best = float(max_distance)
+        while True:
+            candidates = self.cell_segments(i, j)
+            if len(candidates):
+                dist = float(ray_distances(x, y, dx, dy, self.segment_array[candidates], max_distance))
+                best = min(best, dist)
+
+            # 最近的交點已經在這一格之內，後面的格子不可能更近
+            t_exit = min(t_max_x, t_max_y)
+            if best <= t_exit - self.EPS or t_exit > t_leave:
+                break
+
+            if t_max_x < t_max_y:
+                i += step_i
+                t_max_x += t_delta_x
+            else:
+                j += step_j
+                t_max_y += t_delta_y
+            if not (0 <= i < self.nx and 0 <= j < self.ny):
+                break
+
+        return best
+
+    def circle_hits(self, cx, cy, radius):
+        # 只檢查圓的 bounding box 附近的線段，判斷方式跟暴力法一樣用 is_circle_near_segment
+        candidates = self.query_box(cx - radius, cy - radius, cx + radius, cy + radius)
+        for k in candidates:
+            x1, y1, x2, y2 = self.segment_array[k]
+            if is_circle_near_segment(cx, cy, radius, x1, y1, x2, y2):
+                return True
+        return False
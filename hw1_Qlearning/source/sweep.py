@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import multiprocessing
+import numpy as np
+from contextlib import redirect_stdout
+from track import Track
+from track_cache import load_track
+from env import CarEnv, BatchCarEnv
+from agent import Agent, ConfigBatchAgent
+from sensors import SensorArray
+from trainer import QLearningTrainer, ConfigBatchTrainer, PlateauStopper
+from reward_stats import RewardStats
+
+ANGLE_CHOICES = [-40, 0, 40]
+
+BASELINE_CONFIG = {
+    "lr": 0.31,
+    "epsilon": 1.0,
+    "epsilon_decay": 0.995,
+    "discount_factor": 0.95,
+    "trace_lambda": 0.0
+}
+
+def grid_space(base, **choices):
+    """
+    Grid search：choices 的每個參數值做笛卡兒積，沒列出的參數用 base 的值
+    grid_space(BASELINE_CONFIG, lr=[0.1, 0.5], epsilon_decay=[0.99, 0.95]) -> 4 組
+    """
+    names = list(choices)
+    configs = []
+    for values in itertools.product(*(choices[n] for n in names)):
+        config = dict(base)
+        config.update(zip(names, values))
+        configs.append(config)
+    return configs
+
+def random_space(base, samples, seed=None, **ranges):
+    """
+    Random search：ranges 的值是 (low, high) 就均勻抽樣，是 list 就從裡面隨機挑
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        config = dict(base)
+        for name, space in ranges.items():
+            if isinstance(space, tuple):
+                config[name] = rng.uniform(*space)
+            else:
+                config[name] = rng.choice(space)
+        configs.append(config)
+    return configs
+
+def one_at_a_time(base, **variants):
+    # 原本 run_all_experiments 的做法：baseline 加上每次只改一個參數的組合
+    configs = [dict(base)]
+    for name, values in variants.items():
+        for value in values:
+            config = dict(base)
+            config[name] = value
+            configs.append(config)
+    return configs
+
+# 後來才加進 BASELINE_CONFIG 的參數，沒寫這些參數的 config（例如舊的結果）當成用這裡的預設值
+CONFIG_DEFAULTS = {"trace_lambda": 0.0}
+
+def run_key(config, seed, settings=None):
+    # 用參數 + seed + 這次 sweep 的設定（賽道、episode 數、步數上限……）當成 run 的 key，續跑時拿來判斷是否已經有結果
+    config = {**CONFIG_DEFAULTS, **config}
+    return json.dumps({"config": config, "seed": seed, "settings": settings}, sort_keys=True)
+
+def file_hash(path):
+    # 賽道檔內容的 hash：檔案改過或換了賽道，舊的結果就不會被當成已完成
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+def run_config(task):
+    # 子 process 執行的單次訓練（要放在 module 最外層才能被 pickle）
+    config, seed, track_path, episodes, sensor_beams, backend, max_steps, plateau = task
+    random.seed(seed)
+    track = load_track(track_path, backend=backend)
+    env = CarEnv(track, sensors=SensorArray.evenly_spaced(sensor_beams), angle_choices=ANGLE_CHOICES)
+    agent = Agent(**config)
+
+    trainer = QLearningTrainer(env, agent, max_steps, PlateauStopper(*plateau) if plateau else None)
+
+    # Agent.decay_epsilon 每個 episode 都會 print，很多 process 一起跑時先吃掉
+    with redirect_stdout(io.StringIO()):
+        rewards = trainer.train(episodes)
+    return config, seed, rewards, trainer.stop_reason
+
+class Sweep:
+    """
+    把很多組 Agent 參數 x seed 丟進 process pool 平行訓練
+    每跑完一組就 append 一行 JSON 到 results_path，中斷後重跑會跳過已經有結果的組合
+    max_steps 是每個 episode 的步數上限（避免繞圈的 policy 卡住整個 sweep），
+    plateau 給 (window, patience, min_delta) 的話 reward 停滯就提早結束，結果裡的 stop_reason 會記錄原因
+    每筆結果都會記錄 settings（賽道內容的 hash 和其他所有訓練設定），只有 settings 一樣的結果才算已完成，
+    用不同設定寫進同一個結果檔的舊結果會被忽略（stale() 可以查有幾筆）
+    batched=True 時 run() 改用 run_batched()：亂數來源不同、不支援 plateau，所以 settings 會多記 "mode": "batched"，
+    兩種跑法的結果不會被當成同一組
+    """
+    def __init__(self, track_path, configs, seeds=(0,), episodes=300, results_path="sweep_results.jsonl",
+                 processes=None, sensor_beams=3, backend="brute", max_steps=1000, plateau=None, batched=False):
+        if batched and plateau:
+            raise ValueError("batched sweeps do not support plateau early stopping")
+        self.track_path = os.path.abspath(track_path)
+        self.configs = [dict(c) for c in configs]
+        self.seeds = list(seeds)
+        self.episodes = episodes
+        self.results_path = results_path
+        self.processes = processes or os.cpu_count() or 1
+        self.sensor_beams = sensor_beams
+        self.backend = backend
+        self.max_steps = max_steps
+        self.plateau = tuple(plateau) if plateau else None
+        self.batched = batched
+        # 存成 JSON 再讀回來會是一樣的值（tuple 先轉成 list），才能直接跟結果檔裡的比較
+        self.settings = {
+            "track": file_hash(self.track_path),
+            "episodes": episodes,
+            "max_steps": max_steps,
+            "sensor_beams": sensor_beams,
+            "backend": backend,
+            "plateau": list(self.plateau) if self.plateau else None,
+        }
+        if batched:
+            self.settings["mode"] = "batched"
+
+    def results(self):
+        # 結果檔裡跟這次設定相同的結果
+        return [r for r in load_results(self.results_path) if r.get("settings") == self.settings]
+
+    def stale(self):
+        # 結果檔裡用其他設定跑出來、這次不會用到的結果數
+        return len(load_results(self.results_path)) - len(self.results())
+
+    def completed(self):
+        # 已經寫進結果檔的 run key
+        return {run_key(r["config"], r["seed"], self.settings) for r in self.results()}
+
+    def pending(self):
+        done = self.completed()
+        return [
+            (config, seed, self.track_path, self.episodes, self.sensor_beams, self.backend, self.max_steps, self.plateau)
+            for config in self.configs for seed in self.seeds
+            if run_key(config, seed, self.settings) not in done
+        ]
+
+    def run(self, callback=None):
+        """
+        執行還沒跑過的組合，結果一跑完就寫檔並呼叫 callback(config, seed, rewards, stop_reason)
+        :return: 結果檔裡設定相同的所有結果（包含之前跑的）
+        """
+        if self.batched:
+            return self.run_batched(callback)
+        tasks = self.pending()
+        if tasks:
+            # 先轉好二進位賽道快取，避免每個 process 同時去轉
+            load_track(self.track_path, backend=self.backend)
+            # 用 spawn 比較保險：GUI process 有 Qt 的 thread，不適合 fork
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(min(self.processes, len(tasks))) as pool, open(self.results_path, "a") as f:
+                for config, seed, rewards, stop_reason in pool.imap_unordered(run_config, tasks):
+                    write_result(f, config, seed, rewards, stop_reason, self.settings)
+                    if callback:
+                        callback(config, seed, rewards, stop_reason)
+        return self.results()
+
+    def run_batched(self, callback=None):
+        """
+        不開 process，把還沒跑過的 (參數, seed) 全部放進一個 ConfigBatchAgent 在同一個 process 一起訓練
+        結果檔格式跟 run() 一樣、也一樣能續跑，但 settings 記成 "mode": "batched"，不會跟 run() 的結果混用
+        （亂數來源不同，同一個 seed 的結果不會跟 run() 的逐步相同；也不支援 plateau 提早結束）
+        """
+        if not self.batched:
+            raise ValueError("create the Sweep with batched=True to run it batched")
+        tasks = self.pending()
+        if tasks:
+            configs = [t[0] for t in tasks]
+            seeds = [t[1] for t in tasks]
+            track = load_track(self.track_path, backend=self.backend)
+            rng = np.random.default_rng(seeds)
+            agent = ConfigBatchAgent(configs, num_actions=len(ANGLE_CHOICES), num_sensors=self.sensor_beams, rng=rng)
+            env = BatchCarEnv(track, len(tasks), ANGLE_CHOICES,
+                              sensors=SensorArray.evenly_spaced(self.sensor_beams), rng=rng)
+
+            with open(self.results_path, "a") as f:
+                def on_finished(i, rewards):
+                    write_result(f, configs[i], seeds[i], rewards, "episodes", self.settings)
+                    if callback:
+                        callback(configs[i], seeds[i], rewards, "episodes")
+
+                ConfigBatchTrainer(env, agent, self.max_steps).train(self.episodes, on_finished)
+        return self.results()
+
+def write_result(f, config, seed, rewards, stop_reason, settings=None):
+    f.write(json.dumps({"config": config, "seed": seed, "rewards": rewards, "stop_reason": stop_reason,
+                        "settings": settings}) + "\n")
+    f.flush()
+
+def load_results(path):
+    # 讀結果檔；最後一行如果是中斷時寫到一半的就略過
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return results
+
+def main():
+    # python sweep.py ../../軌道座標點.txt --lr 0.1 0.3 0.5 --epsilon-decay 0.99 0.95 --seeds 0 1 2
+    parser = argparse.ArgumentParser(description="Parallel Q-learning hyperparameter sweep")
+    parser.add_argument("track", help="track file (same format as the GUI import)")
+    parser.add_argument("--lr", type=float, nargs="+")
+    parser.add_argument("--epsilon", type=float, nargs="+")
+    parser.add_argument("--epsilon-decay", type=float, nargs="+")
+    parser.add_argument("--discount-factor", type=float, nargs="+")
+    parser.add_argument("--trace-lambda", type=float, nargs="+")
+    parser.add_argument("--random", type=int, default=0, metavar="N",
+                        help="sample N random configs between the min and max of each given list instead of a grid")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--episodes", type=int, default=300)
+    parser.add_argument("--sensor-beams", type=int, default=3)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--vectorized", action="store_true",
+                        help="train every config in one process as rows of a batched Q tensor")
+    parser.add_argument("--results", default="sweep_results.jsonl")
+    parser.add_argument("--max-steps", type=int, default=1000, help="per-episode step cap")
+    parser.add_argument("--patience", type=int, default=0,
+                        help="stop a run after this many episodes without improving the windowed mean (0: off)")
+    parser.add_argument("--plateau-window", type=int, default=50)
+    parser.add_argument("--min-delta", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.vectorized and args.trace_lambda and max(args.trace_lambda) > 0:
+        parser.error("--vectorized does not support eligibility traces; drop --trace-lambda or --vectorized")
+    if args.vectorized and args.patience:
+        parser.error("--vectorized does not support early stopping; drop --patience or --vectorized")
+
+    space = {name: getattr(args, name) for name in BASELINE_CONFIG if getattr(args, name) is not None}
+    if args.random:
+        configs = random_space(BASELINE_CONFIG, args.random, seed=0,
+                               **{name: (min(v), max(v)) for name, v in space.items()})
+    else:
+        configs = grid_space(BASELINE_CONFIG, **space)
+
+    sweep = Sweep(args.track, configs, args.seeds, args.episodes, args.results,
+                  args.processes, args.sensor_beams, args.backend, args.max_steps,
+                  (args.plateau_window, args.patience, args.min_delta) if args.patience else None,
+                  batched=args.vectorized)
+    stale = sweep.stale()
+    if stale:
+        print(f"Ignoring {stale} results in {args.results} recorded with a different track or settings")
+    print(f"{len(sweep.pending())} of {len(configs) * len(args.seeds)} runs to go")
+
+    def report(config, seed, rewards, stop_reason):
+        stats = RewardStats.from_rewards(rewards)
+        print(f"seed={seed} {config}  average reward (last {min(len(stats), stats.last_n)}): {stats.last_mean:.2f}"
+              f"  [{len(rewards)} episodes, stopped: {stop_reason}]", flush=True)
+
+    sweep.run(report)
+
+if __name__ == "__main__":
+    main()
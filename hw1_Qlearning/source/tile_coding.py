@@ -0,0 +1,40 @@
+import numpy as np
+
+class TileCoder:
+    """
+    把感測器距離轉成 tile coding 的特徵：num_tilings 層互相錯開的格子，每層挑出一格
+    每一格的座標用 hash 映射到固定大小 memory_size 的權重陣列，所以記憶體用量不會隨解析度變大
+    距離超過 max_distance 的視為 max_distance（遠處的差別對開車沒有意義）
+    """
+    # 座標 hash 用的大質數，每個維度一個
+    PRIMES = np.array([73856093, 19349663, 83492791, 49979687, 67867967, 86028121, 15485863, 32452843], dtype=np.int64)
+
+    def __init__(self, num_sensors=3, num_tilings=8, tile_width=5, max_distance=40, memory_size=4096):
+        if num_sensors + 1 > len(self.PRIMES):
+            raise ValueError(f"TileCoder supports at most {len(self.PRIMES) - 1} sensors")
+        self.num_sensors = num_sensors
+        self.num_tilings = num_tilings
+        self.tile_width = tile_width
+        self.max_distance = max_distance
+        self.memory_size = memory_size
+
+        # 第 t 層在第 d 維的位移是 t * (2d + 1) / num_tilings 格（不對稱的位移，避免各層沿對角線疊在一起）
+        dims = 2 * np.arange(num_sensors) + 1
+        self.offsets = (np.arange(num_tilings)[:, None] * dims[None, :] % num_tilings) * tile_width / num_tilings
+
+    def encode(self, sensor_values):
+        # 單筆：回傳 num_tilings 個權重索引的 tuple（可以當 dict key）
+        return tuple(int(i) for i in self.encode_batch(np.asarray(sensor_values, dtype=float)[None, :])[0])
+
+    def encode_batch(self, sensor_values):
+        """
+        :param sensor_values: (N, num_sensors)
+        :return: (N, num_tilings) 的權重索引
+        """
+        s = np.minimum(np.asarray(sensor_values, dtype=float), self.max_distance)
+        coords = np.floor((s[:, None, :] + self.offsets[None, :, :]) / self.tile_width).astype(np.int64)
+
+        # 把 (tiling, 各維座標) 混成一個整數再取餘數
+        h = np.arange(self.num_tilings, dtype=np.int64)[None, :] * self.PRIMES[-1]
+        h = h ^ (coords * self.PRIMES[:self.num_sensors]).sum(axis=-1)
+        return h % self.memory_size
@@ -0,0 +1,88 @@
+import os
+import sys
+import hashlib
+import numpy as np
+from geometry import parse_track_file, border_to_segments
+from track import Track
+
+# 二進位賽道格式：一個 float64 的 .npy 陣列，可以用 np.load(mmap_mode='r') 直接 memory-map
+# 多個 worker 讀同一個檔案時共用作業系統的 page cache，不會各自複製一份
+#   [0:16]   header：MAGIC, VERSION, 邊界點數 N, start(3), start_tl(2), start_br(2), goal_tl(2), goal_br(2), 保留(2)
+#   [16:16+2N]        邊界點 (N, 2)
+#   [16+2N:16+6N]     線段 (N, 4)，x1, y1, x2, y2
+MAGIC = 7.0e6 + 0.25
+VERSION = 1.0
+HEADER_SIZE = 16
+SUFFIX = ".track.npy"
+
+def binary_path_for(text_path, cache_dir=None):
+    # cache_dir 沒給就放在文字檔旁邊；有給的話檔名加上原路徑的 hash，不同資料夾的同名賽道不會互相蓋掉
+    if cache_dir is None:
+        return os.path.splitext(text_path)[0] + SUFFIX
+    stem = os.path.splitext(os.path.basename(text_path))[0]
+    digest = hashlib.sha1(os.path.abspath(text_path).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{stem}_{digest}{SUFFIX}")
+
+def write_binary_track(text_path, binary_path=None):
+    # 文字格式 -> 二進位格式，回傳寫出的路徑
+    if binary_path is None:
+        binary_path = binary_path_for(text_path)
+    start, start_tl, start_br, goal_tl, goal_br, border = parse_track_file(text_path)
+    n = len(border)
+
+    data = np.zeros(HEADER_SIZE + 6 * n)
+    data[:HEADER_SIZE] = [MAGIC, VERSION, n, *start, *start_tl, *start_br, *goal_tl, *goal_br, 0.0, 0.0]
+    data[HEADER_SIZE:HEADER_SIZE + 2 * n] = np.asarray(border, dtype=float).reshape(-1)
+    data[HEADER_SIZE + 2 * n:] = np.asarray(border_to_segments(border), dtype=float).reshape(-1)
+
+    # 先寫暫存檔再 rename，多個 worker 同時轉檔也不會讀到寫一半的檔案
+    tmp_path = f"{binary_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, binary_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return binary_path
+
+def read_binary_track(binary_path, mmap=True, backend="brute", cell_size=None):
+    data = np.load(binary_path, mmap_mode='r' if mmap else None)
+    if data.ndim != 1 or len(data) < HEADER_SIZE or data[0] != MAGIC:
+        raise ValueError(f"Not a binary track file: {binary_path}")
+    if data[1] != VERSION:
+        raise ValueError(f"Unsupported binary track version {data[1]} in {binary_path}")
+
+    header = data[:HEADER_SIZE].tolist()
+    n = int(header[2])
+    border = data[HEADER_SIZE:HEADER_SIZE + 2 * n].reshape(n, 2)
+    segments = data[HEADER_SIZE + 2 * n:HEADER_SIZE + 6 * n].reshape(n, 4)
+    return Track(
+        tuple(header[3:6]), tuple(header[6:8]), tuple(header[8:10]), tuple(header[10:12]), tuple(header[12:14]),
+        border, backend=backend, cell_size=cell_size, segment_array=segments
+    )
+
+def load_track(path, mmap=True, backend="brute", cell_size=None, cache_dir=None):
+    """
+    讀賽道：.track.npy 直接 memory-map；文字檔的話先找二進位快取（預設在文字檔旁邊，或 cache_dir 裡），
+    沒有或比文字檔舊就自動轉一次
+    快取寫不進去（例如賽道放在唯讀的位置）就直接解析文字檔，不使用快取
+    """
+    if path.endswith(SUFFIX):
+        return read_binary_track(path, mmap, backend, cell_size)
+
+    binary_path = binary_path_for(path, cache_dir)
+    if not os.path.exists(binary_path) or os.path.getmtime(binary_path) < os.path.getmtime(path):
+        try:
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+            write_binary_track(path, binary_path)
+        except OSError:
+            return Track.from_file(path, backend=backend, cell_size=cell_size)
+    return read_binary_track(binary_path, mmap, backend, cell_size)
+
+if __name__ == "__main__":
+    # 預先把一整批賽道轉成二進位：python track_cache.py tracks/*.txt
+    for text_path in sys.argv[1:]:
+        print(write_binary_track(text_path))
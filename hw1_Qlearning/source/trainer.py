@@ -0,0 +1,300 @@
+import numpy as np
+from reward_stats import RewardStats
+
+class PlateauStopper:
+    """
+    reward 停滯就提早結束訓練：每個 episode 結束後看最近 window 個 episode 的平均，
+    連續 patience 個 episode 都沒有比目前最好的平均多 min_delta 以上就停
+    """
+    def __init__(self, window=50, patience=50, min_delta=1.0):
+        self.window = window
+        self.patience = patience
+        self.min_delta = min_delta
+        self.reset()
+
+    def reset(self):
+        self.best = -np.inf
+        self.wait = 0
+        self.stats = RewardStats(self.window)
+
+    def update(self, reward_history):
+        # 每個 episode 結束呼叫一次，只看最新的一筆；回傳 True 表示該停了
+        self.stats.update(reward_history[-1])
+        if len(self.stats) < self.window:
+            return False
+        mean = self.stats.moving_average
+        if mean > self.best + self.min_delta:
+            self.best = mean
+            self.wait = 0
+            return False
+        self.wait += 1
+        return self.wait >= self.patience
+
+class QLearningTrainer:
+    """
+    Q-learning 的訓練流程（原本寫在 TrackWindow 裡的 train_step / run_batch_training）
+    不碰任何 GUI 物件，GUI 用 step() 一步一步跑再自己畫圖，批次訓練直接呼叫 train()
+
+    max_steps：每個 episode 最多走幾步，超過就當作結束（truncated，不給額外 reward），避免車子一直繞圈
+    stopper：PlateauStopper，reward 停滯時 train() 提早結束
+    stop_reason 記錄 train() 為什麼停下來："episodes"（跑完指定數量）或 "plateau"
+    stats 是 reward 的 RewardStats，每個 episode 結束時更新，GUI 跟 summary 直接查它
+    fast_forward > 0 時離牆越遠同一個動作一次走越多步（最多 fast_forward 步，env 要用 continuous=True 才不會穿牆）
+    走了 k 步的 transition 用 r1 + gamma * r2 + ... + gamma^(k-1) * rk 當 reward、gamma^k 折扣下一個 state
+    """
+    def __init__(self, env, agent, max_steps=None, stopper=None, fast_forward=0):
+        self.env = env
+        self.agent = agent
+        self.max_steps = max_steps
+        self.stopper = stopper
+        self.fast_forward = fast_forward
+        self.reward_history = []
+        self.stats = RewardStats()
+        self.current_episode = 0
+        self.truncated_episodes = 0
+        self.truncated = False  # 最後一步是不是因為 max_steps 才結束
+        self.stop_reason = None
+        self.sensor = None
+
+    def reset(self):
+        self.sensor = self.env.reset()
+        return self.sensor
+
+    def step(self):
+        """
+        跑一個 transition 並更新 Q-table，episode 結束時記錄 reward、衰減 epsilon
+        :return: (state, action, reward, next_state, done)
+        """
+        if self.sensor is None:
+            self.reset()
+
+        # 1. 取得state
+        state = self.agent.get_state(self.sensor)
+
+        # 2. 根據state 選擇action 並更新car
+        action = self.agent.select_action(state)
+        if self.fast_forward > 0:
+            repeat = self.env.suggest_repeat(self.sensor, self.fast_forward)
+            if self.max_steps is not None:
+                repeat = max(1, min(repeat, self.max_steps - self.env.steps))
+            next_sensor, _, done = self.env.step(action, repeat)
+            gamma = self.agent.gamma
+            reward = sum(r * gamma ** i for i, r in enumerate(self.env.last_rewards))
+            discount = gamma ** len(self.env.last_rewards)
+        else:
+            next_sensor, reward, done = self.env.step(action)
+            discount = None
+
+        # 3. 更新state
+        next_state = self.agent.get_state(next_sensor)
+
+        # 4. 更新 Q-table
+        self.agent.update_q_table(state, action, reward, next_state, discount)
+        self.sensor = next_sensor
+
+        # 5. episode 結束（撞牆、到終點或步數用完）
+        self.truncated = not done and self.max_steps is not None and self.env.steps >= self.max_steps
+        if done or self.truncated:
+            self.reward_history.append(self.env.total_reward)
+            self.stats.update(self.env.total_reward)
+            self.agent.decay_epsilon()
+            self.agent.reset_traces()
+            self.current_episode += 1
+            self.truncated_episodes += self.truncated
+            self.sensor = None
+
+        return state, action, reward, next_state, done or self.truncated
+
+    def run_episode(self):
+        self.reset()
+        done = False
+        while not done:
+            *_, done = self.step()
+        return self.reward_history[-1]
+
+    def train(self, episodes):
+        self.stop_reason = "episodes"
+        if self.stopper:
+            self.stopper.reset()
+        for _ in range(episodes):
+            self.run_episode()
+            if self.stopper and self.stopper.update(self.reward_history):
+                self.stop_reason = "plateau"
+                break
+        return self.reward_history.copy()
+
+class DynaQLearningTrainer(QLearningTrainer):
+    """
+    QLearningTrainer 加上 replay：每個真實的 transition 照常更新一次後存進 ReplayBuffer，
+    再從 buffer 抽 planning_steps 批、每批 batch_size 筆做向量化的 TD 更新（Dyna 式的 planning）
+    agent 要用 DenseAgent
+    planning_lr 沒給就用 agent.lr；同一筆資料會被重複更新很多次，lr 太大容易震盪，通常要設小一點
+    prioritized buffer 的每筆更新會乘上 buffer.importance_weights，修正照 priority 抽樣的偏差
+    """
+    def __init__(self, env, agent, buffer, planning_steps=1, batch_size=32, planning_lr=None,
+                 max_steps=None, stopper=None):
+        super().__init__(env, agent, max_steps, stopper)
+        self.buffer = buffer
+        self.planning_steps = planning_steps
+        self.batch_size = batch_size
+        self.planning_lr = planning_lr
+
+    def step(self):
+        state, action, reward, next_state, done = super().step()
+        # 步數用完不是真的終止狀態，replay 時還是要往後 bootstrap
+        self.buffer.add(state, action, reward, next_state, done and not self.truncated)
+        self.plan()
+        return state, action, reward, next_state, done
+
+    def plan(self):
+        for _ in range(self.planning_steps):
+            idx, states, actions, rewards, next_states, dones = self.buffer.sample(self.batch_size)
+            weights = self.buffer.importance_weights(idx) if self.buffer.prioritized else None
+            td_error = self.agent.update_q_table_batch(states, actions, rewards, next_states, dones, self.planning_lr,
+                                                       weights)
+            if self.buffer.prioritized:
+                self.buffer.update_priorities(idx, td_error)
+
+class BatchQLearningTrainer:
+    """
+    K 個環境同時跑、共用同一張 Q-table 的 Q-learning（環境是 BatchCarEnv）
+    state、action、TD 更新都一次處理 K 筆，所以 agent 要用有向量化介面的 DenseAgent
+    每個環境結束就各自記錄 reward、衰減 epsilon 並重設，episode 數的算法跟 QLearningTrainer 一樣
+    max_steps / stopper / stop_reason 的意思也跟 QLearningTrainer 一樣
+    agent.trace_lambda > 0 時每個環境各自有 eligibility trace（Watkins Q(λ)），環境結束就清掉自己的 trace
+    """
+    def __init__(self, env, agent, max_steps=None, stopper=None):
+        self.env = env
+        self.agent = agent
+        self.max_steps = max_steps
+        self.stopper = stopper
+        self.reward_history = []
+        self.stats = RewardStats()
+        self.current_episode = 0
+        self.truncated_episodes = 0
+        self.stop_reason = None
+        self.plateaued = False
+        self.sensors = None
+
+    def reset(self):
+        self.sensors = self.env.reset()
+        return self.sensors
+
+    def step(self):
+        """
+        K 個環境各跑一個 transition
+        :return: (states, actions, rewards, next_states, dones)，每個都是長度 K 的陣列
+        """
+        if self.sensors is None:
+            self.reset()
+        agent = self.agent
+
+        states = agent.encode_states(self.sensors)
+        actions = agent.select_actions(states)
+        next_sensors, rewards, dones = self.env.step(actions)
+        next_states = agent.encode_states(next_sensors)
+        if agent.trace_lambda > 0:
+            agent.cut_traces_batch(states, actions)
+            agent.update_q_table_traces_batch(states, actions, rewards, next_states)
+        else:
+            agent.update_q_table_batch(states, actions, rewards, next_states)
+
+        if self.max_steps is not None:
+            truncated = ~dones & (self.env.steps >= self.max_steps)
+            self.truncated_episodes += int(np.count_nonzero(truncated))
+            dones = dones | truncated
+
+        if np.any(dones):
+            for total in self.env.total_rewards[dones]:
+                self.reward_history.append(float(total))
+                self.stats.update(total)
+                agent.decay_epsilon()
+                self.current_episode += 1
+                if self.stopper and self.stopper.update(self.reward_history):
+                    self.plateaued = True
+            agent.reset_batch_traces(dones)
+            self.env.reset(dones)
+            next_sensors[dones] = self.env.observe(dones)
+        self.sensors = next_sensors
+
+        return states, actions, rewards, next_states, dones
+
+    def train(self, episodes):
+        # 跑到至少完成 episodes 個 episode；最後一步可能同時多結束幾個，只回傳前 episodes 個
+        target = self.current_episode + episodes
+        start = len(self.reward_history)
+        self.stop_reason = "episodes"
+        self.plateaued = False
+        if self.stopper:
+            self.stopper.reset()
+        self.reset()
+        self.agent.reset_batch_traces()
+        while self.current_episode < target:
+            self.step()
+            if self.plateaued:
+                self.stop_reason = "plateau"
+                break
+        return self.reward_history[start:start + episodes]
+
+class ConfigBatchTrainer:
+    """
+    ConfigBatchAgent 的訓練流程：第 i 台車只更新第 i 組參數的 Q-table，
+    每一步把全部參數組一起往前推，reward 記錄也是每組分開
+    max_steps 跟 QLearningTrainer 一樣；所有參數組是一起跑的，所以不做個別的提早結束
+    """
+    def __init__(self, env, agent, max_steps=None):
+        if env.num_envs != agent.num_configs:
+            raise ValueError("BatchCarEnv needs one car per agent config")
+        self.env = env
+        self.agent = agent
+        self.max_steps = max_steps
+        self.reward_histories = [[] for _ in range(agent.num_configs)]
+        self.stats = [RewardStats() for _ in range(agent.num_configs)]
+        self.sensors = None
+
+    def reset(self):
+        self.sensors = self.env.reset()
+        return self.sensors
+
+    def step(self):
+        if self.sensors is None:
+            self.reset()
+        agent = self.agent
+
+        states = agent.encode_states(self.sensors)
+        actions = agent.select_actions(states)
+        next_sensors, rewards, dones = self.env.step(actions)
+        next_states = agent.encode_states(next_sensors)
+        agent.update_q_table_batch(states, actions, rewards, next_states)
+
+        if self.max_steps is not None:
+            dones = dones | (self.env.steps >= self.max_steps)
+
+        if np.any(dones):
+            for i in np.flatnonzero(dones):
+                self.reward_histories[i].append(float(self.env.total_rewards[i]))
+                self.stats[i].update(self.env.total_rewards[i])
+            agent.decay_epsilon(dones)
+            self.env.reset(dones)
+            next_sensors[dones] = self.env.observe(dones)
+        self.sensors = next_sensors
+
+        return states, actions, rewards, next_states, dones
+
+    def train(self, episodes, callback=None):
+        """
+        跑到每組參數都至少完成 episodes 個 episode
+        callback(index, rewards) 在第 index 組剛好完成時呼叫一次（跑得快的組不用等其他組）
+        :return: 每組參數前 episodes 個 episode 的 reward
+        """
+        self.reset()
+        finished = [len(h) >= episodes for h in self.reward_histories]
+        while not all(finished):
+            *_, dones = self.step()
+            for i in np.flatnonzero(dones):
+                history = self.reward_histories[i]
+                if not finished[i] and len(history) >= episodes:
+                    finished[i] = True
+                    if callback:
+                        callback(i, history[:episodes])
+        return [h[:episodes] for h in self.reward_histories]
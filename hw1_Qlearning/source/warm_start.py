@@ -0,0 +1,46 @@
+import numpy as np
+from offline import TransitionLog, snap_angles
+
+def rollout_demonstrations(env, decide, max_steps=1000):
+    """
+    用連續輸出的 controller（例如 FuzzyController.decide_actions）同時開 env.num_envs 台車，每台跑一個 episode
+    輸出的角度對到最接近的 angle_choices，記錄成 TransitionLog，之後拿來預熱 Q-table / replay
+    :param env: BatchCarEnv
+    :param decide: decide(sensors (M, beams)) -> (M,) 的方向盤角度（度），一步只呼叫一次
+    """
+    sensors = env.reset()
+    running = np.ones(env.num_envs, dtype=bool)
+    actions = np.zeros(env.num_envs, dtype=np.int64)
+    logs = []
+    for _ in range(max_steps):
+        actions[running] = snap_angles(decide(sensors[running]), env.angle_choices)
+        next_sensors, rewards, dones = env.step(actions)
+        logs.append((sensors[running], actions[running], rewards[running], next_sensors[running], dones[running]))
+        running &= ~dones
+        if not running.any():
+            break
+        sensors = next_sensors
+    return TransitionLog(*(np.concatenate(column) for column in zip(*logs)), env.angle_choices)
+
+def seed_q_table(agent, log, passes=1):
+    """
+    訓練前先把示範的 transition 餵給 agent.update_q_table（Agent / DenseAgent / TileCodingAgent 都可以）
+    每一輪從最後一步倒著更新，終點 / 撞牆的 reward 一輪就能往回傳到整條軌跡
+    預熱時不用 eligibility trace（transition 不是照順序走的），結束後再還原
+    """
+    states = [agent.get_state(sensor) for sensor in log.sensors]
+    next_states = [agent.get_state(sensor) for sensor in log.next_sensors]
+    trace_lambda = getattr(agent, "trace_lambda", 0.0)
+    agent.trace_lambda = 0.0
+    try:
+        for _ in range(passes):
+            for i in reversed(range(len(log))):
+                agent.update_q_table(states[i], int(log.actions[i]), log.rewards[i], next_states[i])
+    finally:
+        agent.trace_lambda = trace_lambda
+        agent.reset_traces()
+
+def seed_replay(buffer, agent, log):
+    # 示範資料直接放進 replay，Dyna 的 planning 一開始就有東西可以抽
+    buffer.add_batch(agent.encode_states(log.sensors), log.actions, log.rewards,
+                     agent.encode_states(log.next_sensors), log.dones)
@@ -1,11 +1,13 @@
 import math
-from geometry import cast_ray
+import numpy as np
+from sensors import SensorArray
 
 class Car:
-    def __init__(self, x, y, theta=90): # 初始角度為90度
+    def __init__(self, x, y, theta=90, sensors=None): # 初始角度為90度
         self.x = x
         self.y = y
         self.theta = theta
+        self.sensors = sensors if sensors is not None else SensorArray()  # 預設三條 (θ-45, θ, θ+45)
 
     def move_forward(self, theta, step=1, wheel_base=6):
         rad_phi = math.radians(self.theta)
@@ -33,9 +35,63 @@ class Car:
             theta -= 360
         return theta
 
-    def get_sensor_distances(self, border_segments):
-        angles = [self.theta - 45, self.theta, self.theta + 45]
-        return [
-            cast_ray(self.x, self.y, angle, border_segments)
-            for angle in angles
-        ]
+    def get_sensor_distances(self, track):
+        # 所有射線一次算完，回傳 list 維持原本的介面
+        return self.sensors.read(track, self.x, self.y, self.theta).tolist()
+
+class CarBatch:
+    """
+    N 台車的 struct-of-arrays 版本：x, y, theta 各是一個長度 N 的 numpy 陣列
+    move_forward 用跟 Car 一樣的運動方程式，一次更新全部的車
+    """
+    def __init__(self, xs, ys, thetas=90, sensors=None):
+        xs, ys, thetas = np.broadcast_arrays(
+            np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), np.asarray(thetas, dtype=float)
+        )
+        self.x = np.array(xs, dtype=float).reshape(-1)
+        self.y = np.array(ys, dtype=float).reshape(-1)
+        self.theta = np.array(thetas, dtype=float).reshape(-1)
+        self.sensors = sensors if sensors is not None else SensorArray()
+
+    @classmethod
+    def from_cars(cls, cars, sensors=None):
+        return cls([c.x for c in cars], [c.y for c in cars], [c.theta for c in cars], sensors)
+
+    def __len__(self):
+        return len(self.x)
+
+    def move_forward(self, steering, wheel_base=6):
+        # steering: 每台車的方向盤角度（度），可以是純量或長度 N 的陣列
+        rad_phi = np.radians(self.theta)
+        rad_theta = np.radians(np.asarray(steering, dtype=float))
+
+        self.x += np.cos(rad_phi + rad_theta) + np.sin(rad_theta) * np.sin(rad_phi)
+        self.y += np.sin(rad_phi + rad_theta) - np.sin(rad_theta) * np.cos(rad_phi)
+
+        delta_phi = np.degrees(np.arcsin(2 * np.sin(rad_theta) / wheel_base))
+        self.theta = self.normalize_angle(self.theta - delta_phi)
+
+    @staticmethod
+    def normalize_angle(theta): # phi: -90 ~ 270
+        # 跟 Car.normalize_angle 一樣，只調整超出範圍的角度
+        theta = np.asarray(theta, dtype=float)
+        wraps = np.floor((theta + 90) / 360)
+        return np.where(wraps != 0, theta - wraps * 360, theta)
+
+    def get_sensor_distances(self, track):
+        # 回傳 (N, beams)
+        return self.sensors.read_batch(track, self.x, self.y, self.theta)
+
+    def collide(self, track, radius=3):
+        # 回傳 (撞牆 mask, 到最近牆壁的距離)
+        return track.collide_circles(self.x, self.y, radius)
+
+    def reset(self, mask, xs, ys, thetas=90):
+        # 只重設 mask 為 True 的車（xs, ys, thetas 可以是純量或跟被選到的車一樣長）
+        self.x[mask] = xs
+        self.y[mask] = ys
+        self.theta[mask] = thetas
+
+    def car(self, index):
+        # 取出第 index 台車（畫圖或除錯用）
+        return Car(float(self.x[index]), float(self.y[index]), float(self.theta[index]), self.sensors)
@@ -0,0 +1,118 @@
+import os
+import hashlib
+import numpy as np
+from geometry import circles_near_segments
+
+class DistanceField:
+    """
+    賽道的 signed distance field（到最近牆壁的距離，賽道內為正、賽道外為負）
+    在固定解析度的格點上預先算好，查詢時用雙線性內插，每台車都是 O(1)
+    內插有誤差（大約一個格子大小以內），需要精確結果時還是用 Track.hits_wall
+    """
+    def __init__(self, values, origin, resolution, segment_array, border_points):
+        self.values = values              # (ny, nx)，values[j, i] 是格點 (origin + (i, j) * resolution) 的距離
+        self.origin = origin
+        self.resolution = resolution
+        self.segment_array = segment_array
+        self.border_points = np.asarray(border_points, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def build(cls, track, resolution=0.5, margin=None):
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if margin is None:
+            margin = 2 * resolution
+
+        xmin, ymin, xmax, ymax = track.bbox
+        xmin -= margin
+        ymin -= margin
+        nx = int(np.ceil((xmax + margin - xmin) / resolution)) + 1
+        ny = int(np.ceil((ymax + margin - ymin) / resolution)) + 1
+        xs = xmin + np.arange(nx) * resolution
+
+        values = np.empty((ny, nx))
+        # 分批算，避免 (格點數 x 線段數) 的暫存陣列太大
+        rows_per_chunk = max(1, 4_000_000 // max(nx * max(track.num_segments, 1), 1))
+        for j0 in range(0, ny, rows_per_chunk):
+            j1 = min(ny, j0 + rows_per_chunk)
+            gy, gx = np.meshgrid(ymin + np.arange(j0, j1) * resolution, xs, indexing='ij')
+            values[j0:j1] = signed_distance(gx, gy, track.segment_array, track.border_points)
+
+        return cls(values, (xmin, ymin), resolution, track.segment_array, track.border_points)
+
+    @classmethod
+    def for_track(cls, track, resolution=0.5, cache_dir="sdf_cache"):
+        """
+        先找磁碟快取（用賽道內容的 hash 當 key），沒有的話才重算並存起來
+        cache_dir 給 None 就不使用快取
+        """
+        if cache_dir is None:
+            return cls.build(track, resolution)
+
+        path = os.path.join(cache_dir, f"sdf_{track_hash(track)}_{resolution:g}.npz")
+        if os.path.exists(path):
+            data = np.load(path)
+            return cls(data["values"], tuple(data["origin"]), float(data["resolution"]),
+                       track.segment_array, track.border_points)
+
+        field = cls.build(track, resolution)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(path, values=field.values, origin=np.array(field.origin), resolution=field.resolution)
+        return field
+
+    def distance(self, xs, ys):
+        """
+        查詢任意點到最近牆壁的 signed distance（雙線性內插）
+        超出格點範圍的點改用精確算法
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+        ny, nx = self.values.shape
+        fx = (xs - self.origin[0]) / self.resolution
+        fy = (ys - self.origin[1]) / self.resolution
+
+        i = np.clip(np.floor(fx).astype(int), 0, nx - 2)
+        j = np.clip(np.floor(fy).astype(int), 0, ny - 2)
+        tx = fx - i
+        ty = fy - j
+
+        v00 = self.values[j, i]
+        v10 = self.values[j, i + 1]
+        v01 = self.values[j + 1, i]
+        v11 = self.values[j + 1, i + 1]
+        result = (v00 * (1 - tx) + v10 * tx) * (1 - ty) + (v01 * (1 - tx) + v11 * tx) * ty
+
+        outside = (fx < 0) | (fx > nx - 1) | (fy < 0) | (fy > ny - 1)
+        if np.any(outside):
+            result = np.array(result)
+            result[outside] = signed_distance(xs[outside], ys[outside], self.segment_array, self.border_points)
+        return result
+
+    def collide(self, xs, ys, radii=3):
+        # 圓心到牆壁的距離 <= 半徑（或已經在賽道外）就算撞牆
+        return self.distance(xs, ys) <= radii
+
+def signed_distance(xs, ys, segment_array, border_points):
+    # 精確的 signed distance：距離用 circles_near_segments，正負號用射線法判斷點是否在賽道多邊形內
+    _, dist = circles_near_segments(xs, ys, 0, segment_array)
+    return np.where(points_in_polygon(xs, ys, border_points), dist, -dist)
+
+def points_in_polygon(xs, ys, polygon):
+    # even-odd rule：往 +x 方向的水平射線跟多邊形邊的交點數為奇數就在內部
+    polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    px = np.asarray(xs, dtype=float)[..., None]
+    py = np.asarray(ys, dtype=float)[..., None]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    straddle = (y1 > py) != (y2 > py)
+    dy = np.where(y2 == y1, 1.0, y2 - y1)
+    x_cross = x1 + (py - y1) * (x2 - x1) / dy
+    crossings = np.count_nonzero(straddle & (px < x_cross), axis=-1)
+    return crossings % 2 == 1
+
+def track_hash(track):
+    # 用賽道內容算 hash，同一個檔案（或同樣的座標）就會對到同一份快取
+    h = hashlib.sha1()
+    h.update(np.asarray(track.start + track.goal_tl + track.goal_br, dtype=float).tobytes())
+    h.update(np.ascontiguousarray(track.border_points, dtype=float).tobytes())
+    return h.hexdigest()[:16]
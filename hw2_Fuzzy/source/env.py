@@ -0,0 +1,201 @@
+import random
+import numpy as np
+from car import Car, CarBatch
+
+class CarEnv:
+    """
+    不依賴 PyQt 的模擬環境：包住 Car、Track 以及 reward / 結束條件
+    GUI 只負責把 env.car 畫出來，訓練可以直接在一般的 Python process 裡跑
+
+    angle_choices 有給的話 step(action) 的 action 是索引（hw1 的離散動作），
+    沒給的話 action 就直接是方向盤角度（hw2 模糊控制、hw3 MLP）
+
+    continuous=True 時改用連續碰撞偵測（檢查每一步掃過的膠囊），
+    搭配 step(action, repeat=k) 一次快轉 k 步也不會穿牆
+    """
+    def __init__(self, track, sensors=None, angle_choices=None, radius=3,
+                 start_x_range=(-3, 3), start_theta=90,
+                 goal_reward=1000, crash_reward=-100, step_reward=1, rng=None, continuous=False):
+        self.track = track
+        self.sensors = sensors
+        self.angle_choices = angle_choices
+        self.radius = radius  # 車子半徑
+        self.start_x_range = start_x_range
+        self.start_theta = start_theta
+        self.goal_reward = goal_reward
+        self.crash_reward = crash_reward
+        self.step_reward = step_reward
+        self.rng = rng if rng is not None else random
+        self.continuous = continuous
+
+        self.car = None
+        self.steps = 0
+        self.total_reward = 0
+        self.last_rewards = []  # 上一次 step() 每一小步各自的 reward（快轉時長度就是實際走的步數）
+
+    def reset(self, x=None, theta=None):
+        # 起點 y 固定，x 在 start_x_range 內隨機
+        if x is None:
+            x = self.rng.uniform(*self.start_x_range)
+        if theta is None:
+            theta = self.start_theta
+        self.car = Car(x, self.track.start[1], theta=theta, sensors=self.sensors)
+        self.steps = 0
+        self.total_reward = 0
+        return self.observe()
+
+    def observe(self):
+        return self.car.get_sensor_distances(self.track)
+
+    def steering_of(self, action):
+        if self.angle_choices is None:
+            return action
+        return self.angle_choices[action]
+
+    def move(self, action):
+        # 只移動車子，不計算 reward（給有自己評分方式的 PSO 用）
+        self.car.move_forward(self.steering_of(action))
+        self.steps += 1
+
+    def get_reward(self):
+        x, y = self.car.x, self.car.y
+
+        if self.track.in_goal(x, y):
+            return self.goal_reward, True
+
+        if self.track.hits_wall(x, y, self.radius):
+            return self.crash_reward, True
+
+        return self.step_reward, False
+
+    def step(self, action, repeat=1):
+        """
+        執行一步：移動 -> 算 reward -> 讀新的感測器
+        :param repeat: 同一個 action 連續走幾步（快轉），reward 為每一步的總和
+                       每一小步的 reward 另外存在 self.last_rewards，TD 更新要逐步折扣時用
+        :return: (next_sensor, reward, done)
+        """
+        self.last_rewards = []
+        if not self.continuous:
+            done = False
+            for _ in range(repeat):
+                self.move(action)
+                step_reward, done = self.get_reward()
+                self.last_rewards.append(step_reward)
+                if done:
+                    break
+        else:
+            done = self.sweep(action, repeat)
+
+        reward = sum(self.last_rewards)
+        self.total_reward += reward
+        return self.observe(), reward, done
+
+    def sweep(self, action, repeat):
+        # 先把 repeat 步的位置都算出來，再一次檢查每一小段掃過的範圍
+        # 每一小步的 reward 加進 self.last_rewards，回傳是否結束
+        car = self.car
+        poses = [(car.x, car.y, car.theta)]
+        for _ in range(repeat):
+            car.move_forward(self.steering_of(action))
+            poses.append((car.x, car.y, car.theta))
+
+        xs = [p[0] for p in poses]
+        ys = [p[1] for p in poses]
+        impacts = self.track.time_of_impact(xs[:-1], ys[:-1], xs[1:], ys[1:], self.radius)
+
+        rewards = self.last_rewards
+        for i, t in enumerate(impacts):
+            x, y, theta = poses[i + 1]
+            self.steps += 1
+            if t < 1:
+                # 途中撞牆：車子停在碰撞的位置
+                car.x = xs[i] + t * (x - xs[i])
+                car.y = ys[i] + t * (y - ys[i])
+                car.theta = theta
+                rewards.append(self.crash_reward)
+                return True
+            if self.track.in_goal(x, y) or t == 1:
+                car.x, car.y, car.theta = x, y, theta
+                if self.track.in_goal(x, y):
+                    rewards.append(self.goal_reward)
+                    return True
+                rewards.append(self.crash_reward)  # 剛好在終點位置碰到牆
+                return True
+            rewards.append(self.step_reward)
+        return False
+
+    def suggest_repeat(self, sensor, max_repeat=8):
+        # 離牆越遠可以快轉越多步，靠近牆壁時回到一步一步走
+        clearance = min(sensor) - self.radius
+        return int(max(1, min(max_repeat, clearance // 2)))
+
+class BatchCarEnv:
+    """
+    K 台車同時跑的 CarEnv：車子用 CarBatch 存，移動、感測器、reward 都一次算完
+    每台車各自結束、各自重設，step 回傳的是移動後（重設前）的感測器，方便做 TD 更新
+    action 固定是 angle_choices 的索引
+    """
+    def __init__(self, track, num_envs, angle_choices, sensors=None, radius=3,
+                 start_x_range=(-3, 3), start_theta=90,
+                 goal_reward=1000, crash_reward=-100, step_reward=1, rng=None):
+        self.track = track
+        self.num_envs = num_envs
+        self.angle_choices = np.asarray(angle_choices, dtype=float)
+        self.sensors = sensors
+        self.radius = radius
+        self.start_x_range = start_x_range
+        self.start_theta = start_theta
+        self.goal_reward = goal_reward
+        self.crash_reward = crash_reward
+        self.step_reward = step_reward
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.cars = None
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.total_rewards = np.zeros(num_envs)
+
+    def reset(self, mask=None):
+        """
+        mask 沒給就全部重設並回傳 (K, beams) 的感測器
+        有給的話只重設 mask 為 True 的車，不回傳（需要的話再呼叫 observe(mask)）
+        """
+        if mask is None or self.cars is None:
+            xs = self.rng.uniform(*self.start_x_range, self.num_envs)
+            self.cars = CarBatch(xs, self.track.start[1], self.start_theta, sensors=self.sensors)
+            self.steps[:] = 0
+            self.total_rewards[:] = 0
+            return self.observe()
+
+        count = int(np.count_nonzero(mask))
+        self.cars.reset(mask, self.rng.uniform(*self.start_x_range, count), self.track.start[1], self.start_theta)
+        self.steps[mask] = 0
+        self.total_rewards[mask] = 0
+
+    def observe(self, mask=None):
+        cars = self.cars
+        if mask is None:
+            return cars.get_sensor_distances(self.track)
+        return cars.sensors.read_batch(self.track, cars.x[mask], cars.y[mask], cars.theta[mask])
+
+    def get_rewards(self):
+        # 跟 CarEnv.get_reward 一樣：先看是否到終點，再看是否撞牆
+        x, y = self.cars.x, self.cars.y
+        gx1, gy1 = self.track.goal_tl
+        gx2, gy2 = self.track.goal_br
+        in_goal = (gx1 <= x) & (x <= gx2) & (gy2 <= y) & (y <= gy1)
+        crashed, _ = self.cars.collide(self.track, self.radius)
+
+        rewards = np.where(in_goal, self.goal_reward, np.where(crashed, self.crash_reward, self.step_reward))
+        return rewards.astype(float), in_goal | crashed
+
+    def step(self, actions):
+        """
+        :param actions: (K,) 每台車的 action 索引
+        :return: (next_sensors (K, beams), rewards (K,), dones (K,))
+        """
+        self.cars.move_forward(self.angle_choices[np.asarray(actions, dtype=np.int64)])
+        self.steps += 1
+        rewards, dones = self.get_rewards()
+        self.total_rewards += rewards
+        return self.observe(), rewards, dones
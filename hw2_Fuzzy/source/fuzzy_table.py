@@ -0,0 +1,128 @@
+import argparse
+import os
+import time
+import numpy as np
+from fuzzy import FuzzyController
+
+# 模糊控制查表的二進位格式：一個 int16 的 .npy 陣列，可以 memory-map
+#   [0:4]   header：MAGIC, VERSION, 每個軸的格點數 n, 格點間距（千分之一單位）
+#   [4:]    n * n * n 個方向盤角度，索引順序是 (right, front, left)
+MAGIC = 0x465A
+VERSION = 1
+HEADER_SIZE = 4
+SUFFIX = ".fuzzy.npy"
+STEP_SCALE = 1000
+
+class FuzzyTable:
+    """
+    FuzzyController 是三個距離的固定函數，事先在 (right, front, left) 的格點上算好，之後每次決策只查表
+    格點是 0, step, 2 * step, ..., max_distance；超過 max_distance 的距離當成 max_distance
+    （side 超過 20、front 超過 30 之後輸出就不會再變，max_distance 預設 40 不會有誤差）
+    nearest：取最近的格點，輸出一定是 Rules 的五種角度之一
+    interpolated：三線性內插，輸出是連續的角度，規則切換的地方會變平滑
+    """
+    MODES = ("nearest", "interpolated")
+
+    def __init__(self, table, step, mode="nearest"):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}")
+        self.table = table
+        self.step = step
+        self.mode = mode
+        self.size = table.shape[0]
+        self.max_distance = (self.size - 1) * step
+
+    @classmethod
+    def compile(cls, controller=None, step=0.5, max_distance=40, mode="nearest"):
+        controller = controller if controller is not None else FuzzyController()
+        axis = np.arange(int(round(max_distance / step)) + 1) * step
+        n = len(axis)
+        table = np.empty((n, n, n), dtype=np.int16)
+        front, left = np.meshgrid(axis, axis, indexing='ij')
+        for i, right in enumerate(axis):
+            # 一次算一個 right 切面，避免格點很密時一次配置太大的陣列
+            readings = np.stack([np.full(front.size, right), front.ravel(), left.ravel()], axis=1)
+            table[i] = controller.decide_actions(readings).reshape(n, n)
+        return cls(table, step, mode)
+
+    def decide_action(self, sensor_data):
+        if self.mode == "nearest":
+            # 單筆查表不經過 numpy 的陣列運算，才不會比原本的 controller 還慢
+            right, front, left = (max(round(min(d, self.max_distance) / self.step), 0) for d in sensor_data)
+            return int(self.table[right, front, left])
+        return float(self.decide_actions(np.asarray(sensor_data, dtype=float)[None, :])[0])
+
+    def decide_actions(self, sensor_data):
+        # (N, 3) 的 (right, front, left) -> (N,) 的方向盤角度
+        x = np.clip(np.nan_to_num(np.asarray(sensor_data, dtype=float) / self.step), 0, self.size - 1)
+        if self.mode == "nearest":
+            i = np.rint(x).astype(np.int64)
+            return self.table[i[:, 0], i[:, 1], i[:, 2]]
+
+        i0 = np.minimum(np.floor(x).astype(np.int64), self.size - 2)
+        frac = x - i0
+        result = np.zeros(len(x))
+        for corner in range(8):
+            bits = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            weight = np.prod(np.where(bits, frac, 1 - frac), axis=1)
+            i = i0 + bits
+            result += weight * self.table[i[:, 0], i[:, 1], i[:, 2]]
+        return result
+
+    def deviation(self, controller=None, samples=200000, rng=None):
+        """
+        跟原本的 controller 比較：在 [0, max_distance] 內均勻抽 samples 個讀數
+        :return: (最大誤差, 平均誤差, 輸出不同的比例)，單位是度
+        """
+        controller = controller if controller is not None else FuzzyController()
+        rng = rng if rng is not None else np.random.default_rng()
+        readings = rng.uniform(0, self.max_distance, (samples, 3))
+        error = np.abs(self.decide_actions(readings) - controller.decide_actions(readings))
+        return float(error.max()), float(error.mean()), float(np.mean(error > 1e-9))
+
+    def save(self, path):
+        step = self.step * STEP_SCALE
+        if step != round(step) or not 0 < step <= np.iinfo(np.int16).max:
+            raise ValueError(f"step must be a multiple of 1/{STEP_SCALE} and at most {np.iinfo(np.int16).max / STEP_SCALE}")
+        header = np.array([MAGIC, VERSION, self.size, round(step)], dtype=np.int16)
+        data = np.concatenate([header, self.table.ravel()]).astype(np.int16)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mode="nearest", mmap=True):
+        data = np.load(path, mmap_mode='r' if mmap else None)
+        if data.ndim != 1 or len(data) < HEADER_SIZE or data[0] != MAGIC:
+            raise ValueError(f"Not a fuzzy table file: {path}")
+        if data[1] != VERSION:
+            raise ValueError(f"Unsupported fuzzy table version {data[1]} in {path}")
+
+        n, step = int(data[2]), int(data[3]) / STEP_SCALE
+        return cls(data[HEADER_SIZE:].reshape(n, n, n), step, mode)
+
+def main():
+    # python fuzzy_table.py controller.fuzzy.npy --step 0.5
+    parser = argparse.ArgumentParser(description="Compile the fuzzy controller into a 3-D lookup table")
+    parser.add_argument("out", help=f"output table file ({SUFFIX})")
+    parser.add_argument("--step", type=float, default=0.5, help="grid spacing of each sensor axis")
+    parser.add_argument("--max-distance", type=float, default=40, help="readings beyond this are clamped")
+    parser.add_argument("--samples", type=int, default=200000, help="random readings used to measure the deviation")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = FuzzyTable.compile(step=args.step, max_distance=args.max_distance)
+    print(f"{table.size}^3 grid compiled in {time.perf_counter() - start:.2f}s -> {table.save(args.out)}")
+
+    loaded = FuzzyTable.load(args.out)
+    for mode in FuzzyTable.MODES:
+        loaded.mode = mode
+        worst, mean, mismatch = loaded.deviation(samples=args.samples, rng=np.random.default_rng(args.seed))
+        print(f"{mode:>12}: max deviation {worst:.2f} deg, mean {mean:.3f} deg, {mismatch:.2%} of readings differ")
+
+if __name__ == "__main__":
+    main()
@@ -4,120 +4,10 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtGui import QPolygonF, QPen, QColor, QPainterPath, QBrush
 from PyQt5.QtCore import QPointF, Qt, QTimer
-from geometry import parse_track_file, border_to_segments, is_circle_near_segment
-from car import Car
+from track import Track
+from env import CarEnv
+from fuzzy import FuzzyController
 import math
-import random
-
-from enum import Enum
-
-class Level(Enum):
-    SMALL = 0
-    MEDIUM = 1
-    LARGE = 2
-
-class MembershipFunctions:
-    @staticmethod
-    def side_small(distance):
-        if distance < 10:
-            return 1
-        elif distance < 12:
-            return (12 - distance) / 2
-        else:
-            return 0
-
-    @staticmethod
-    def side_medium(distance):
-        if 8 < distance <= 12:
-            return (distance - 8) / 4
-        elif 12 < distance <= 16:
-            return (16 - distance) / 4
-        else:
-            return 0
-
-    @staticmethod
-    def side_large(distance):
-        if 13 < distance <= 20:
-            return (distance - 13) / 7
-        elif distance > 20:
-            return 1
-        else:
-            return 0
-
-    @staticmethod
-    def front_small(distance):
-        if distance < 10:
-            return 1
-        elif distance < 15:
-            return (15 - distance) / 5
-        else:
-            return 0
-
-    @staticmethod
-    def front_medium(distance):
-        if 19 < distance <= 21:
-            return (distance - 19) / 2
-        elif 21 < distance <= 23:
-            return (23 - distance) / 2
-        else:
-            return 0
-
-    @staticmethod
-    def front_large(distance):
-        if distance > 30:
-            return 1
-        else:
-            return 0
-
-class Fuzzifier:
-    @staticmethod
-    def to_level(s, m, l):
-        return Level([s, m, l].index(max([s, m, l])))
-
-    @staticmethod
-    def l_point(distance):
-        s = MembershipFunctions.side_small(distance)
-        m = MembershipFunctions.side_medium(distance)
-        l = MembershipFunctions.side_large(distance)
-        return Fuzzifier.to_level(s, m, l)
-
-    @staticmethod
-    def r_point(distance):
-        s = MembershipFunctions.side_small(distance)
-        m = MembershipFunctions.side_medium(distance)
-        l = MembershipFunctions.side_large(distance)
-        return Fuzzifier.to_level(s, m, l)
-
-    @staticmethod
-    def c_point(distance):
-        s = MembershipFunctions.front_small(distance)
-        m = MembershipFunctions.front_medium(distance)
-        l = MembershipFunctions.front_large(distance)
-        return Fuzzifier.to_level(s, m, l)
-
-class Rules:
-    @staticmethod
-    def apply(l_point, c_point, r_point):
-        if r_point == Level.SMALL:
-            return -40
-        if l_point == Level.SMALL:
-            return 40
-        if r_point == Level.MEDIUM and c_point == Level.SMALL:
-            return -20
-        if l_point == Level.MEDIUM and c_point == Level.SMALL:
-            return 20
-        return 0
-
-class FuzzyController:
-    def __init__(self):
-        self.fuzzifier = Fuzzifier()
-
-    def decide_action(self, sensor_data):
-        right, front, left = sensor_data
-        l_point = self.fuzzifier.l_point(left)
-        c_point = self.fuzzifier.c_point(front)
-        r_point = self.fuzzifier.r_point(right)
-        return Rules.apply(l_point, c_point, r_point)
 
 class TrackWindow(QWidget):
     def __init__(self):
@@ -141,10 +31,11 @@ class TrackWindow(QWidget):
         self.view.scale(2, 2)
         main_layout.addWidget(self.view, 3)  # 右邊佔 3 份寬度
 
+        self.env = None  # 不依賴 GUI 的模擬環境，畫面只負責顯示 env.car
         self.car = None
         self.car_item = None
         self.car_dir_line = None
-        self.border_points = []
+        self.track = None
         self.SCALE = 4
         self.timer = QTimer()
         self.timer.timeout.connect(self.simulation_step)
@@ -240,26 +131,24 @@ class TrackWindow(QWidget):
         if not path:
             return
 
-        start, start_tl, start_br, goal_tl, goal_br, border = parse_track_file(path)
-        self.start = start
-        self.goal_tl = goal_tl
-        self.goal_br = goal_br
-        self.draw_track(start, start_tl, start_br, goal_tl, goal_br, border)
+        self.track = Track.from_file(path)
+        self.draw_track(self.track)
 
-    def draw_track(self, start, start_tl, start_br, goal_tl, goal_br, border_points):
-        self.border_points = border_points
+    def draw_track(self, track):
+        self.track = track
+        start = track.start
         self.scene.clear()
 
         # 畫邊界
-        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in border_points])
+        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in track.border_points])
         self.scene.addPolygon(poly, QPen(QColor("gray"), 1))
 
         # 畫起點
         self.scene.addEllipse(start[0] * self.SCALE - 3, -start[1] * self.SCALE - 3, 6, 6, brush=QColor("red"))
 
         # 畫終點
-        x1, y1 = goal_tl
-        x2, y2 = goal_br
+        x1, y1 = track.goal_tl
+        x2, y2 = track.goal_br
         goal_poly = QPolygonF([
             QPointF(x1 * self.SCALE, -y1 * self.SCALE),
             QPointF(x2 * self.SCALE, -y1 * self.SCALE),
@@ -268,8 +157,10 @@ class TrackWindow(QWidget):
         ])
         self.scene.addPolygon(goal_poly, QPen(QColor("green"), 1, style=3))
 
-        # 初始化車輛
-        self.car = Car(start[0] * self.SCALE, start[1] * self.SCALE, theta=start[2])
+        # 初始化環境與車輛
+        self.env = CarEnv(track)
+        self.env.reset(x=start[0], theta=start[2])
+        self.car = self.env.car
         self.update_car_graphics()
 
     def reset_car(self):
@@ -278,9 +169,8 @@ class TrackWindow(QWidget):
         if self.car_dir_line:
             self.scene.removeItem(self.car_dir_line)
 
-        random_x = random.uniform(-3, 3)
-        theta = 90
-        self.car = Car(random_x, self.start[1], theta=theta)
+        self.env.reset()  # 起點 x 在 -3 ~ 3 隨機、角度 90
+        self.car = self.env.car
 
         if self.trajectory_item:
             self.scene.removeItem(self.trajectory_item)
@@ -304,7 +194,7 @@ class TrackWindow(QWidget):
         self.car_theta_label.setText(f"θ: {self.car.theta:.1f}°")
 
         # 更新感測器資訊
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
+        sensor = self.car.get_sensor_distances(self.track)
         self.sensor_left_label.setText(f"Left: {sensor[2]:.2f}")
         self.sensor_front_label.setText(f"Front: {sensor[1]:.2f}")
         self.sensor_right_label.setText(f"Right: {sensor[0]:.2f}")
@@ -353,30 +243,14 @@ class TrackWindow(QWidget):
         self.log_decision("🛑 Simulation manually stopped.")
 
     def simulation_step(self):
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
+        sensor = self.env.observe()
         action = self.fuzzy_controller.decide_action(sensor)
-        self.car.move_forward(action)
+        _, reward, done = self.env.step(action)
         self.update_car_graphics()
 
-        reward, done = self.get_reward()
         if done:
             self.timer.stop()
             self.log_decision("✅ Simulation complete.")
 
-    def get_reward(self):
-        x, y = self.car.x, self.car.y
-        radius = 3
-
-        gx1, gy1 = self.goal_tl
-        gx2, gy2 = self.goal_br
-        if gx1 <= x <= gx2 and gy2 <= y <= gy1:
-            return 1000, True
-
-        for x1, y1, x2, y2 in border_to_segments(self.border_points):
-            if is_circle_near_segment(x, y, radius, x1, y1, x2, y2):
-                return -100, True
-
-        return 1, False
-
     def log_decision(self, text):
         self.decision_log.append(text)
\ No newline at end of file
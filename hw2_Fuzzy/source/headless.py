@@ -0,0 +1,98 @@
+import argparse
+import random
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import CarEnv, BatchCarEnv
+from fuzzy import FuzzyController
+from fuzzy_table import FuzzyTable
+
+STEERING_ANGLES = [-40, -20, 0, 20, 40]  # Rules.apply 可能的輸出
+OUTCOMES = ("goal", "crash", "timeout")  # timeout：跑到 max_steps 還沒結束
+
+def run_episode(env, controller, max_steps=10000):
+    # 跑一回合模糊控制，回傳 (OUTCOMES 之一, 步數, 總 reward)
+    sensor = env.reset()
+    reward, done = 0, False
+    while not done and env.steps < max_steps:
+        action = controller.decide_action(sensor)
+        sensor, reward, done = env.step(action)
+    if not done:
+        return "timeout", env.steps, env.total_reward
+    return "goal" if reward == env.goal_reward else "crash", env.steps, env.total_reward
+
+def run_batch(track, controller, num_envs, max_steps=10000, rng=None):
+    """
+    num_envs 台車同時跑模糊控制（BatchCarEnv + decide_actions），每台跑一個回合
+    :param rng: 起點位置用的 numpy Generator
+    :return: (OUTCOMES 之一, 步數, 總 reward)，每個都是長度 num_envs 的陣列
+    """
+    env = BatchCarEnv(track, num_envs, STEERING_ANGLES, rng=rng)
+    sensors = env.reset()
+    steps = np.zeros(num_envs, dtype=np.int64)
+    totals = np.zeros(num_envs)
+    reached_goal = np.zeros(num_envs, dtype=bool)
+    crashed = np.zeros(num_envs, dtype=bool)
+    running = np.ones(num_envs, dtype=bool)
+    for _ in range(max_steps):
+        # Rules 的輸出剛好都在 STEERING_ANGLES 裡，searchsorted 直接換成索引
+        actions = np.searchsorted(STEERING_ANGLES, controller.decide_actions(sensors))
+        sensors, rewards, dones = env.step(actions)
+        totals[running] += rewards[running]
+        steps[running] += 1
+        reached_goal |= running & dones & (rewards == env.goal_reward)
+        crashed |= running & dones & (rewards != env.goal_reward)
+        running &= ~dones
+        if not running.any():
+            break
+    outcomes = np.where(reached_goal, "goal", np.where(crashed, "crash", "timeout"))
+    return outcomes, steps, totals
+
+def summarize(outcomes):
+    counts = {outcome: 0 for outcome in OUTCOMES}
+    for outcome in outcomes:
+        counts[outcome] += 1
+    return ", ".join(f"{outcome} {count}/{len(outcomes)}" for outcome, count in counts.items())
+
+def main():
+    # 不開 GUI 直接模擬：python headless.py ../../軌道座標點.txt --episodes 10
+    parser = argparse.ArgumentParser(description="Headless fuzzy controller simulation (no display / Qt needed)")
+    parser.add_argument("track", help="track file (same format as the GUI import)")
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    parser.add_argument("--num-envs", type=int, default=1,
+                        help="run --episodes in rounds of this many lockstep cars (vectorized fuzzy inference)")
+    parser.add_argument("--table", metavar="PATH",
+                        help="drive with a compiled lookup table (fuzzy_table.py) instead of the exact controller")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.episodes < 1 or args.num_envs < 1:
+        parser.error("--episodes and --num-envs must be at least 1")
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    track = load_track(args.track, backend=args.backend)
+    # nearest 查表的輸出一定是 Rules 的五種角度之一，所以兩條路都能直接換
+    controller = FuzzyTable.load(args.table) if args.table else FuzzyController()
+    if args.num_envs > 1:
+        # --episodes 台車分成好幾輪，每輪最多 num_envs 台一起跑
+        rng = np.random.default_rng(args.seed)
+        rounds = [run_batch(track, controller, min(args.num_envs, args.episodes - start), args.max_steps, rng)
+                  for start in range(0, args.episodes, args.num_envs)]
+        outcomes, steps, totals = (np.concatenate(column) for column in zip(*rounds))
+        print(f"{summarize(outcomes)}  mean steps {steps.mean():.1f}  mean reward {totals.mean():.1f}")
+        return
+
+    env = CarEnv(track)
+    outcomes = []
+    for episode in range(args.episodes):
+        outcome, steps, total_reward = run_episode(env, controller, args.max_steps)
+        outcomes.append(outcome)
+        print(f"Episode {episode + 1}: {outcome} after {steps} steps, reward {total_reward}")
+    print(summarize(outcomes))
+
+if __name__ == "__main__":
+    main()
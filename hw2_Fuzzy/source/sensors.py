@@ -0,0 +1,36 @@
+import numpy as np
+
+class SensorArray:
+    """
+    車子的距離感測器：angles 是每條射線相對車頭方向的角度（度）
+    預設就是原本的三條 (θ-45, θ, θ+45)，順序為 右、前、左
+    所有射線（或很多台車的所有射線）一次丟給 Track.cast_rays 算完
+    """
+    def __init__(self, angles=(-45, 0, 45), max_distance=1000):
+        angles = np.array(angles, dtype=float).reshape(-1)
+        if len(angles) == 0:
+            raise ValueError("SensorArray needs at least one beam")
+        angles.setflags(write=False)
+        self.angles = angles
+        self.max_distance = max_distance
+
+    @classmethod
+    def evenly_spaced(cls, count, spread=45, max_distance=1000):
+        # count 條射線平均分布在 [-spread, spread]，count=3 時就是預設的三條
+        if count == 1:
+            return cls((0,), max_distance)
+        return cls(np.linspace(-spread, spread, count), max_distance)
+
+    def __len__(self):
+        return len(self.angles)
+
+    def read(self, track, x, y, theta):
+        # 單台車：回傳 (beams,) 的距離陣列
+        return track.cast_rays(x, y, theta + self.angles, self.max_distance)
+
+    def read_batch(self, track, xs, ys, thetas):
+        # 多台車：xs, ys, thetas 形狀 (N,)，回傳 (N, beams)
+        xs = np.asarray(xs, dtype=float)[:, None]
+        ys = np.asarray(ys, dtype=float)[:, None]
+        thetas = np.asarray(thetas, dtype=float)[:, None]
+        return track.cast_rays(xs, ys, thetas + self.angles, self.max_distance)
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def parse_track_file(filepath):
     with open(filepath, 'r') as f:
@@ -27,6 +28,41 @@ def cast_ray(x, y, angle_deg, border_segments, max_distance=1000):
 
     return min_dist
 
+def cast_rays(xs, ys, angles_deg, border_segments, max_distance=1000):
+    # 向量化版本的 cast_ray：一次把多條射線跟所有線段求交點
+    # xs, ys, angles_deg 可以是純量或陣列（會 broadcast），回傳同形狀的距離陣列
+    segments = np.asarray(border_segments, dtype=float).reshape(-1, 4)
+    xs, ys, angles_deg = np.broadcast_arrays(
+        np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), np.asarray(angles_deg, dtype=float)
+    )
+
+    rad = np.radians(angles_deg)
+    return ray_distances(xs, ys, np.cos(rad), np.sin(rad), segments, max_distance)
+
+def ray_distances(xs, ys, dxs, dys, segments, max_distance=1000):
+    # 已經有射線方向向量 (dx, dy) 時的求交點，cast_rays 跟空間索引共用這一段
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    dx = np.asarray(dxs, dtype=float)[..., None]  # 多一個維度給線段用
+    dy = np.asarray(dys, dtype=float)[..., None]
+    ox = np.asarray(xs, dtype=float)[..., None]
+    oy = np.asarray(ys, dtype=float)[..., None]
+
+    x1, y1, x2, y2 = segments.T
+    sx = x2 - x1
+    sy = y2 - y1
+
+    # 跟 ray_segment_intersect 同一套公式，只是一次算完所有 (射線, 線段) 組合
+    denom = dx * sy - dy * sx
+    parallel = np.abs(denom) < 1e-8
+    denom = np.where(parallel, 1.0, denom)  # 平行的先換成 1 避免除以 0，之後會被 mask 掉
+
+    t = ((x1 - ox) * sy - (y1 - oy) * sx) / denom
+    u = ((x1 - ox) * dy - (y1 - oy) * dx) / denom
+
+    hit = ~parallel & (t >= 0) & (u >= 0) & (u <= 1)
+    dist = np.where(hit, t * np.hypot(dx, dy), max_distance)
+    return np.min(dist, axis=-1, initial=max_distance)
+
 def ray_segment_intersect(x, y, dx, dy, x1, y1, x2, y2):
     # 射線方向向量 (dx, dy)
     # 線段向量 (sx, sy)
@@ -90,6 +126,102 @@ def is_circle_near_segment(cx, cy, radius, x1, y1, x2, y2):
 
     return dist_sq <= radius ** 2
 
+def circles_near_segments(cxs, cys, radii, segments):
+    # 批次版本的 is_circle_near_segment：一次算 N 台車對所有線段
+    # 回傳 (每台車是否撞牆的 mask, 每台車到最近牆壁的距離)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    cxs, cys, radii = np.broadcast_arrays(
+        np.asarray(cxs, dtype=float), np.asarray(cys, dtype=float), np.asarray(radii, dtype=float)
+    )
+    cx = cxs[..., None]
+    cy = cys[..., None]
+
+    x1, y1, x2, y2 = segments.T
+    dx = x2 - x1
+    dy = y2 - y1
+    length_sq = dx * dx + dy * dy
+    degenerate = length_sq == 0  # 線段是一個點，t 取 0 就是到端點的距離
+    safe_length_sq = np.where(degenerate, 1.0, length_sq)
+
+    t = np.clip(((cx - x1) * dx + (cy - y1) * dy) / safe_length_sq, 0, 1)
+    t = np.where(degenerate, 0.0, t)
+    nearest_x = x1 + t * dx
+    nearest_y = y1 + t * dy
+    dist_sq = (cx - nearest_x) ** 2 + (cy - nearest_y) ** 2
+
+    min_dist_sq = np.min(dist_sq, axis=-1, initial=np.inf)
+    return min_dist_sq <= radii ** 2, np.sqrt(min_dist_sq)
+
+def swept_circles_time_of_impact(x0s, y0s, x1s, y1s, radii, segments, ignore_initial_contact=False):
+    # 連續碰撞偵測：圓心從 (x0, y0) 直線移動到 (x1, y1)，掃過的膠囊跟所有線段比
+    # 回傳第一次碰到牆（距離 <= 半徑）的時間 t ∈ [0, 1]，整段都沒碰到就回傳 inf
+    # 一條線段加上半徑 r 的範圍 = 帶狀區域∩線段範圍 + 兩端點的圓，分別算進入時間取最小
+    # ignore_initial_contact=True：起點本來就貼著牆的話，只有終點還貼著才算撞（跟離散檢查一致）
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    x0s, y0s, x1s, y1s, radii = np.broadcast_arrays(
+        np.asarray(x0s, dtype=float), np.asarray(y0s, dtype=float),
+        np.asarray(x1s, dtype=float), np.asarray(y1s, dtype=float), np.asarray(radii, dtype=float)
+    )
+    px = x0s[..., None]
+    py = y0s[..., None]
+    vx = x1s[..., None] - px
+    vy = y1s[..., None] - py
+    r = radii[..., None]
+
+    x1, y1, x2, y2 = segments.T
+    dx = x2 - x1
+    dy = y2 - y1
+    length_sq = dx * dx + dy * dy
+    degenerate = length_sq == 0
+    safe_length_sq = np.where(degenerate, 1.0, length_sq)
+    length = np.sqrt(safe_length_sq)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 1. 線段中間：到直線的距離 <= r（帶狀區域）且投影落在線段上，兩個 t 區間取交集
+        band_lo, band_hi = _linear_interval(
+            ((px - x1) * dy - (py - y1) * dx) / length, (vx * dy - vy * dx) / length, -r, r
+        )
+        slab_lo, slab_hi = _linear_interval(
+            ((px - x1) * dx + (py - y1) * dy) / safe_length_sq, (vx * dx + vy * dy) / safe_length_sq, 0.0, 1.0
+        )
+        enter = np.maximum(np.maximum(band_lo, slab_lo), 0.0)
+        leave = np.minimum(np.minimum(band_hi, slab_hi), 1.0)
+        t_side = np.where(~degenerate & (enter <= leave), enter, np.inf)
+        if ignore_initial_contact:
+            # 區域是凸的：一開始就在裡面的話，終點還在裡面代表整段都貼著牆
+            t_side = np.where(t_side == 0, np.where(leave >= 1, 1.0, np.inf), t_side)
+
+        # 2. 兩個端點：|P(t) - E| = r 的較小根
+        t_start = _circle_entry(px - x1, py - y1, vx, vy, r, ignore_initial_contact)
+        t_end = _circle_entry(px - x2, py - y2, vx, vy, r, ignore_initial_contact)
+
+    t = np.minimum(t_side, np.minimum(t_start, t_end))
+    return np.min(t, axis=-1, initial=np.inf)
+
+def _linear_interval(value0, rate, lo, hi):
+    # value0 + t * rate 落在 [lo, hi] 的 t 區間（rate = 0 時不是全部就是空集合）
+    inside = (value0 >= lo) & (value0 <= hi)
+    ta = (lo - value0) / rate
+    tb = (hi - value0) / rate
+    t_lo = np.where(rate == 0, np.where(inside, -np.inf, np.inf), np.minimum(ta, tb))
+    t_hi = np.where(rate == 0, np.where(inside, np.inf, -np.inf), np.maximum(ta, tb))
+    return t_lo, t_hi
+
+def _circle_entry(ox, oy, vx, vy, r, ignore_initial_contact=False):
+    # 從 (ox, oy)（相對圓心）沿 (vx, vy) 移動，第一次進入半徑 r 圓內的 t，沒有就 inf
+    a = vx * vx + vy * vy
+    b = 2 * (ox * vx + oy * vy)
+    c = ox * ox + oy * oy - r * r
+    disc = b * b - 4 * a * c
+    t = (-b - np.sqrt(np.maximum(disc, 0))) / (2 * a)
+    hit = (a > 0) & (disc >= 0) & (t >= 0) & (t <= 1)
+    if ignore_initial_contact:
+        end_inside = (ox + vx) ** 2 + (oy + vy) ** 2 <= r * r
+        initial = np.where(end_inside, 1.0, np.inf)
+    else:
+        initial = 0.0
+    return np.where(c <= 0, initial, np.where(hit, t, np.inf))
+
 def distance_to_goal(car_x, car_y, goal_tl, goal_br):
     # 計算車輛到目標區域的距離
     if car_x < goal_tl[0]:
@@ -4,12 +4,12 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtGui import QPolygonF, QPen, QColor, QPainterPath, QBrush
 from PyQt5.QtCore import QPointF, Qt, QTimer
-from geometry import parse_track_file, border_to_segments, is_circle_near_segment
-from car import Car
+from track import Track
+from env import CarEnv
+from sensors import SensorArray
 from pso import PSO
 from mlp import MLP
 import math
-import random
 from time import sleep
 
 class TrackWindow(QWidget):
@@ -34,15 +34,17 @@ class TrackWindow(QWidget):
         self.view.scale(2, 2)
         main_layout.addWidget(self.view, 3)  # 右邊佔 3 份寬度
 
+        self.env = None  # 不依賴 GUI 的模擬環境，畫面只負責顯示 env.car
         self.car = None
         self.car_item = None
         self.car_dir_line = None
-        self.border_points = []
+        self.track = None
         self.SCALE = 4
         self.timer = QTimer()
         self.timer.timeout.connect(self.pso_iteration) # 計時器綁定到simulation_step()，每次觸發都會執行這個function
         self.path = QPainterPath()
         self.trajectory_item = None
+        self.sensors = SensorArray()  # 預設三條感測器
 
     def init_control_panel(self):
         # 匯入座標檔案
@@ -75,6 +77,14 @@ class TrackWindow(QWidget):
         self.iteration = QLineEdit("100")
         pso_layout.addRow(QLabel("iteration:"), self.iteration)
 
+        # 感測器射線數（也是 MLP 的輸入維度）
+        self.sensor_beams_input = QLineEdit("3")
+        pso_layout.addRow(QLabel("Sensor Beams:"), self.sensor_beams_input)
+
+        # 撞牆判斷用的 SDF 格點大小（0 表示用精確算法）
+        self.sdf_resolution_input = QLineEdit("0")
+        pso_layout.addRow(QLabel("SDF Resolution:"), self.sdf_resolution_input)
+
         pso_group.setLayout(pso_layout)
         self.control_layout.addWidget(pso_group)
 
@@ -159,26 +169,24 @@ class TrackWindow(QWidget):
         if not path:
             return
 
-        start, start_tl, start_br, goal_tl, goal_br, border = parse_track_file(path)
-        self.start = start
-        self.goal_tl = goal_tl
-        self.goal_br = goal_br
-        self.draw_track(start, start_tl, start_br, goal_tl, goal_br, border)
+        self.track = Track.from_file(path)
+        self.draw_track(self.track)
 
-    def draw_track(self, start, start_tl, start_br, goal_tl, goal_br, border_points):
-        self.border_points = border_points
+    def draw_track(self, track):
+        self.track = track
+        start = track.start
         self.scene.clear()
 
         # 畫邊界
-        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in border_points])
+        poly = QPolygonF([QPointF(x * self.SCALE, -y * self.SCALE) for x, y in track.border_points])
         self.scene.addPolygon(poly, QPen(QColor("gray"), 1))
 
         # 畫起點
         self.scene.addEllipse(start[0] * self.SCALE - 3, -start[1] * self.SCALE - 3, 6, 6, brush=QColor("red"))
 
         # 畫終點
-        x1, y1 = goal_tl
-        x2, y2 = goal_br
+        x1, y1 = track.goal_tl
+        x2, y2 = track.goal_br
         goal_poly = QPolygonF([
             QPointF(x1 * self.SCALE, -y1 * self.SCALE),
             QPointF(x2 * self.SCALE, -y1 * self.SCALE),
@@ -187,21 +195,24 @@ class TrackWindow(QWidget):
         ])
         self.scene.addPolygon(goal_poly, QPen(QColor("green"), 1, style=3))
 
-        # 初始化車輛
-        self.car = Car(start[0] * self.SCALE, start[1] * self.SCALE, theta=start[2])
+        # 初始化環境與車輛（起點 x 固定為 0）
+        self.env = CarEnv(track, sensors=self.sensors, start_x_range=(0, 0))
+        self.env.reset(x=start[0], theta=start[2])
+        self.car = self.env.car
         self.update_car_graphics()
 
     def reset_car(self):
+        self.env.reset()
+        self.on_car_reset()
+
+    def on_car_reset(self):
+        # env 重置車輛之後，清掉舊的車子與軌跡重新畫
         if self.car_item:
             self.scene.removeItem(self.car_item)
         if self.car_dir_line:
             self.scene.removeItem(self.car_dir_line)
 
-        random_x = random.uniform(0, 0)
-        theta = 90
-        self.car = Car(random_x, self.start[1], theta=theta)
-
-        self.pso.car = self.car  
+        self.car = self.env.car
 
         if self.trajectory_item:
             self.scene.removeItem(self.trajectory_item)
@@ -227,9 +238,9 @@ class TrackWindow(QWidget):
         self.car_theta_label.setText(f"θ: {self.car.theta:.1f}°")
 
         # 更新感測器資訊
-        sensor = self.car.get_sensor_distances(border_to_segments(self.border_points))
-        self.sensor_left_label.setText(f"Left: {sensor[2]:.2f}")
-        self.sensor_front_label.setText(f"Front: {sensor[1]:.2f}")
+        sensor = self.car.get_sensor_distances(self.track)
+        self.sensor_left_label.setText(f"Left: {sensor[-1]:.2f}")
+        self.sensor_front_label.setText(f"Front: {sensor[len(sensor) // 2]:.2f}")
         self.sensor_right_label.setText(f"Right: {sensor[0]:.2f}")
 
         # 更新軌跡線
@@ -274,9 +285,14 @@ class TrackWindow(QWidget):
         social_rate = float(self.social_rate_input.text()) # 社會學習率
         inertia_weight = float(self.inertia_weight_input.text()) # 慣性權重
         iterations = int(self.iteration.text()) # 迭代次數
+        self.sensors = SensorArray.evenly_spaced(int(self.sensor_beams_input.text())) # 感測器
+        self.env.sensors = self.sensors
+        self.car.sensors = self.sensors
+        sdf_resolution = float(self.sdf_resolution_input.text())
+        distance_field = self.env.track.distance_field(sdf_resolution) if sdf_resolution > 0 else None
 
         # 初始化 MLP
-        input_size, hidden_size, output_size = 3, 5, 3  # MLP 結構
+        input_size, hidden_size, output_size = len(self.sensors), 5, 3  # MLP 結構
         self.mlp = MLP(input_size, hidden_size, output_size)
 
         # 初始化 PSO
@@ -286,10 +302,9 @@ class TrackWindow(QWidget):
             social_rate=social_rate,
             inertia_weight=inertia_weight,
             mlp=self.mlp,
-            car=self.car,
-            goal_tl=self.goal_tl,
-            goal_br=self.goal_br,
-            log_function=self.log_decision
+            env=self.env,
+            log_function=self.log_decision,
+            distance_field=distance_field
         )
 
         # 設定 PSO 相關變數
@@ -309,27 +324,20 @@ class TrackWindow(QWidget):
         if self.current_iteration < self.max_iterations:
             # 遍歷所有粒子
             for particle_index in range(self.pso.particle_count):
-                # 重置車輛到起始點
-                self.reset_car()
                 self.log_decision(f"Iteration {self.current_iteration + 1}/{self.max_iterations}, Particle {particle_index + 1}/{self.pso.particle_count}")
 
-                done = False
-                steps = 0
-                # 執行當前粒子的完整模擬
-                while not done and steps < self.max_steps_per_iteration:
-                    done = self.pso.evaluate_particle_step(
-                        steps,
-                        particle_index,
-                        self.border_points,
-                        step_callback=self.update_car_graphics
-                    )
-                    steps += 1
-                    # QTimer.singleShot(100, lambda: None)  # 每個 step 間隔 10ms (0.01 秒)
-                    # sleep(0.01)  # 暫停 10ms，模擬動畫效果
-
+                # 執行當前粒子的完整模擬（PSO 會先把車輛重置到起始點）
+                self.pso.evaluate_particle(
+                    particle_index,
+                    self.max_steps_per_iteration,
+                    reset_callback=self.on_car_reset,
+                    step_callback=self.update_car_graphics
+                )
+                # QTimer.singleShot(100, lambda: None)  # 每個 step 間隔 10ms (0.01 秒)
+                # sleep(0.01)  # 暫停 10ms，模擬動畫效果
 
             # 所有粒子完成後，更新粒子的位置與速度
-            self.pso.optimize_step(self.border_points)
+            self.pso.optimize_step()
 
             # 進入下一次 iteration
             self.current_iteration += 1
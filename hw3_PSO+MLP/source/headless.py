@@ -0,0 +1,66 @@
+import argparse
+import numpy as np
+from track import Track
+from track_cache import load_track
+from env import CarEnv
+from sensors import SensorArray
+from mlp import MLP
+from pso import PSO
+
+def main():
+    # 不開 GUI 直接跑 PSO：python headless.py ../../軌道座標點.txt --iterations 100
+    parser = argparse.ArgumentParser(description="Headless PSO + MLP training (no display / Qt needed)")
+    parser.add_argument("track", help="track file (same format as the GUI import)")
+    parser.add_argument("--particles", type=int, default=50)
+    parser.add_argument("--cognition-rate", type=float, default=1.4)
+    parser.add_argument("--social-rate", type=float, default=1.4)
+    parser.add_argument("--inertia-weight", type=float, default=0.70)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--max-steps", type=int, default=100)
+    parser.add_argument("--sensor-beams", type=int, default=3)
+    parser.add_argument("--backend", choices=Track.BACKENDS, default="brute",
+                        help="'grid' only speeds up single-car queries; batched cars use the vectorized brute-force path")
+    parser.add_argument("--sdf-resolution", type=float, default=0,
+                        help="check wall hits against a signed distance field of this grid size (0: exact)")
+    parser.add_argument("--check-sdf", action="store_true",
+                        help="before training, verify every particle's episode ends on the same step with the SDF")
+    parser.add_argument("--output", default="best_parameters.txt")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        np.random.seed(args.seed)
+
+    sensors = SensorArray.evenly_spaced(args.sensor_beams)
+    env = CarEnv(load_track(args.track, backend=args.backend), sensors=sensors, start_x_range=(0, 0))
+    distance_field = env.track.distance_field(args.sdf_resolution) if args.sdf_resolution > 0 else None
+    if args.check_sdf and distance_field is None:
+        parser.error("--check-sdf needs --sdf-resolution")
+    pso = PSO(
+        particle_count=args.particles,
+        cognition_rate=args.cognition_rate,
+        social_rate=args.social_rate,
+        inertia_weight=args.inertia_weight,
+        mlp=MLP(len(sensors), 5, 3),
+        env=env,
+        log_function=print,
+        distance_field=distance_field
+    )
+
+    if args.check_sdf:
+        exact = pso.termination_steps(args.max_steps)
+        approx = pso.termination_steps(args.max_steps, distance_field)
+        mismatched = [i for i, (a, b) in enumerate(zip(exact, approx)) if a != b]
+        print(f"SDF check: {len(exact) - len(mismatched)}/{len(exact)} particles end on the same step")
+        if mismatched:
+            raise SystemExit(f"SDF resolution {args.sdf_resolution} changes episode termination for particles "
+                             f"{[i + 1 for i in mismatched]}; use a finer --sdf-resolution")
+
+    for iteration in range(args.iterations):
+        pso.run_iteration(args.max_steps)
+        print(f"Iteration {iteration + 1}/{args.iterations} complete. Best fitness: {pso.global_best_score:.2f}")
+
+    pso.save_best_parameters(args.output)
+
+if __name__ == "__main__":
+    main()
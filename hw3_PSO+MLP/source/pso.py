@@ -1,17 +1,18 @@
 import numpy as np
-from geometry import border_to_segments, is_circle_near_segment, distance_to_goal
+from geometry import distance_to_goal
 
 class PSO:
-    def __init__(self, particle_count, cognition_rate, social_rate, inertia_weight, mlp, car, goal_tl, goal_br, log_function=None):
+    def __init__(self, particle_count, cognition_rate, social_rate, inertia_weight, mlp, env, log_function=None, distance_field=None):
         self.particle_count = particle_count
         self.cognition_rate = cognition_rate
         self.social_rate = social_rate
         self.inertia_weight = inertia_weight
         self.mlp = mlp
-        self.car = car
-        self.goal_tl = goal_tl
-        self.goal_br = goal_br
+        self.env = env  # 模擬環境（CarEnv），車子跟賽道都從這裡拿
+        self.goal_tl = env.track.goal_tl
+        self.goal_br = env.track.goal_br
         self.log_function = log_function
+        self.distance_field = distance_field  # 有給的話撞牆判斷改查 SDF（O(1)）
 
         # 初始化粒子位置與速度
         self.particles = [self.initialize_particle() for _ in range(particle_count)]
@@ -23,6 +24,10 @@ class PSO:
         self.global_best_position = self.particles[0].copy()
         self.global_best_score = float('inf')
 
+    @property
+    def car(self):
+        return self.env.car
+
     def initialize_particle(self):
         # 初始化粒子位置（隨機權重與偏置）
         return np.random.uniform(-1, 1, self.get_particle_size())
@@ -55,10 +60,10 @@ class PSO:
 
         return weights_input_hidden, bias_hidden, weights_hidden_output, bias_output
 
-    def fitness_function(self, border_points, steps):
+    def fitness_function(self, steps):
         """
         計算適應度值 (fitness value)
-        :param border_points: 邊界線段
+        :param steps: 目前已走的步數
         :return: fitness value, 是否結束 (True 表示撞牆或抵達終點)
         """
         # 每走一步加 0.1
@@ -72,19 +77,44 @@ class PSO:
             return fitness, True
 
         # 檢查是否撞牆
-        for x1, y1, x2, y2 in border_to_segments(border_points):
-            if is_circle_near_segment(self.car.x, self.car.y, 3, x1, y1, x2, y2):  # 假設車輛半徑為 1 車輛半徑忘記是什麼了
-                fitness += 100  # 撞牆加 100
-                print("Hit the wall!")
-                return fitness, True
+        if self.hits_wall(self.distance_field):
+            fitness += 100  # 撞牆加 100
+            print("Hit the wall!")
+            return fitness, True
 
         return fitness, False
 
-    def evaluate_particle_step(self, steps, particle_index, border_points, step_callback=None):
+    def hits_wall(self, distance_field=None):
+        # 有 distance_field 的話撞牆判斷改查 SDF（O(1)），沒有就用精確的線段距離
+        if distance_field is not None:
+            return bool(distance_field.collide(self.car.x, self.car.y, 3))
+        return self.env.track.hits_wall(self.car.x, self.car.y, 3)  # 假設車輛半徑為 1 車輛半徑忘記是什麼了
+
+    def termination_steps(self, max_steps, distance_field=None):
+        """
+        每個粒子從起點開到結束（抵達終點、撞牆或到達步數上限）要幾步，不更新個體 / 全域最佳
+        用來確認 SDF 的撞牆判斷跟精確算法讓 episode 在同一步結束
+        :param distance_field: 給 None 的話用精確算法
+        """
+        steps_per_particle = []
+        for particle in self.particles:
+            self.mlp.update_weights(*self.decode_particle(particle))
+            self.env.reset()
+            steps = 0
+            while steps < max_steps:
+                angle = np.sum(self.mlp.forward(np.array(self.env.observe())) * np.array([-40, 0, 40]))
+                self.env.move(angle)
+                steps += 1
+                reached_goal = distance_to_goal(self.car.x, self.car.y, self.goal_tl, self.goal_br) <= 3
+                if reached_goal or self.hits_wall(distance_field):
+                    break
+            steps_per_particle.append(steps)
+        return steps_per_particle
+
+    def evaluate_particle_step(self, steps, particle_index, step_callback=None):
         """
         執行粒子的單一步驟，更新車輛狀態並計算適應度
         :param particle_index: 當前粒子的索引
-        :param border_points: 邊界線段
         :param step_callback: 每一步執行後的回調函數，用於更新動畫
         :return: 是否完成（True 表示撞牆或抵達終點）
         """
@@ -95,7 +125,7 @@ class PSO:
         self.mlp.update_weights(weights_input_hidden, bias_hidden, weights_hidden_output, bias_output)
 
         # 使用 MLP 決策車輛行動
-        sensor_data = self.car.get_sensor_distances(border_to_segments(border_points))
+        sensor_data = self.env.observe()
         action_probabilities = self.mlp.forward(np.array(sensor_data))
         # print(action_probabilities)
         angles = np.array([-40, 0, 40])
@@ -103,7 +133,7 @@ class PSO:
         # print(angle)
 
         # 接著讓車輛以該角度前進
-        self.car.move_forward(angle)
+        self.env.move(angle)
 
         # action = np.argmax(action_probabilities)
 
@@ -126,7 +156,7 @@ class PSO:
             # print(f"Particle {particle_index + 1} action: {action}, position: ({self.car.x:.2f}, {self.car.y:.2f}), theta: {self.car.theta:.1f}°")
         
         # 計算當前步驟的 fitness
-        step_fitness, done = self.fitness_function(border_points, steps)
+        step_fitness, done = self.fitness_function(steps)
 
         if step_fitness < self.personal_best_scores[particle_index]:
             self.personal_best_positions[particle_index] = self.particles[particle_index].copy()
@@ -136,10 +166,33 @@ class PSO:
 
         return done
 
-    def optimize_step(self, border_points):
+    def evaluate_particle(self, particle_index, max_steps, reset_callback=None, step_callback=None):
+        """
+        從起點開始跑完一個粒子的整段模擬（撞牆、抵達終點或到達步數上限）
+        :param reset_callback: 車輛重置後的回調函數，用於清除動畫軌跡
+        :param step_callback: 每一步執行後的回調函數，用於更新動畫
+        """
+        self.env.reset()
+        if reset_callback:
+            reset_callback()
+
+        done = False
+        steps = 0
+        while not done and steps < max_steps:
+            done = self.evaluate_particle_step(steps, particle_index, step_callback=step_callback)
+            steps += 1
+
+    def run_iteration(self, max_steps, reset_callback=None, step_callback=None):
+        """
+        一次完整的 PSO iteration：評估所有粒子後更新位置與速度（不需要 GUI）
+        """
+        for particle_index in range(self.particle_count):
+            self.evaluate_particle(particle_index, max_steps, reset_callback, step_callback)
+        self.optimize_step()
+
+    def optimize_step(self):
         """
         執行一次 PSO 優化步驟，更新粒子的位置與速度
-        :param border_points: 邊界線段
         """
         for i, particle in enumerate(self.particles):
             # 更新個體最佳
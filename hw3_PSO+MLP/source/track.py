@@ -0,0 +1,130 @@
+import numpy as np
+from geometry import parse_track_file, border_to_segments, cast_rays, circles_near_segments, swept_circles_time_of_impact
+from spatial_index import UniformGrid
+from distance_field import DistanceField
+
+class Track:
+    """
+    讀檔之後只建一次的賽道物件，把每一步都會用到的線段與衍生陣列先算好存起來
+    建好之後就不能再改（陣列也設成唯讀），其他加速結構可以掛在 _cache 上
+    backend: "brute" 每次掃過所有線段；"grid" 用 UniformGrid 只查附近的線段（線段很多的賽道用）
+    grid 只用在單台車的查詢：UniformGrid 是一條射線 / 一個圓各跑一次 Python 迴圈，
+    多台車一起查（BatchCarEnv、向量化訓練）的時候一律走 numpy 向量化的暴力法，兩種 backend 結果一樣
+    """
+    BACKENDS = ("brute", "grid")
+
+    def __init__(self, start, start_tl, start_br, goal_tl, goal_br, border_points, backend="brute", cell_size=None,
+                 segment_array=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        self.start = tuple(start)          # (x, y, theta)
+        self.start_tl = tuple(start_tl)
+        self.start_br = tuple(start_br)
+        self.goal_tl = tuple(goal_tl)
+        self.goal_br = tuple(goal_br)
+        if isinstance(border_points, np.ndarray):
+            self.border_points = self._readonly(border_points)  # 例如 memory-mapped 的 (N, 2) 陣列，不複製
+        else:
+            self.border_points = tuple(tuple(p) for p in border_points)
+
+        # 線段端點 (M, 4)、起點 / 終點 (M, 2)；已經有現成的（二進位快取）就直接用
+        if segment_array is None:
+            segment_array = np.ascontiguousarray(border_to_segments(self.border_points), dtype=float).reshape(-1, 4)
+        self.segment_array = self._readonly(segment_array)
+        self.seg_start = self._readonly(np.ascontiguousarray(segment_array[:, :2]))
+        self.seg_end = self._readonly(np.ascontiguousarray(segment_array[:, 2:]))
+
+        # 方向向量、長度平方
+        seg_dir = segment_array[:, 2:] - segment_array[:, :2]
+        self.seg_dir = self._readonly(seg_dir)
+        self.seg_len_sq = self._readonly(np.einsum('ij,ij->i', seg_dir, seg_dir))
+
+        # 每條線段的 bounding box (xmin, ymin, xmax, ymax)
+        seg_bbox = np.column_stack([
+            np.minimum(segment_array[:, 0], segment_array[:, 2]),
+            np.minimum(segment_array[:, 1], segment_array[:, 3]),
+            np.maximum(segment_array[:, 0], segment_array[:, 2]),
+            np.maximum(segment_array[:, 1], segment_array[:, 3]),
+        ])
+        self.seg_bbox = self._readonly(seg_bbox)
+
+        # 整個賽道的 bounding box
+        if len(seg_bbox):
+            self.bbox = (
+                float(seg_bbox[:, 0].min()), float(seg_bbox[:, 1].min()),
+                float(seg_bbox[:, 2].max()), float(seg_bbox[:, 3].max()),
+            )
+        else:
+            self.bbox = (0.0, 0.0, 0.0, 0.0)
+
+        self.backend = backend
+        self.index = UniformGrid(segment_array, cell_size) if backend == "grid" else None
+
+        self._cache = {}
+        self._frozen = True
+
+    @classmethod
+    def from_file(cls, filepath, backend="brute", cell_size=None):
+        return cls(*parse_track_file(filepath), backend=backend, cell_size=cell_size)
+
+    @staticmethod
+    def _readonly(array):
+        array.setflags(write=False)
+        return array
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("Track is immutable")
+        super().__setattr__(name, value)
+
+    @property
+    def segments(self):
+        # 舊介面用的線段 tuple（x1, y1, x2, y2），第一次用到才建
+        if "segments" not in self._cache:
+            self._cache["segments"] = tuple(map(tuple, self.segment_array.tolist()))
+        return self._cache["segments"]
+
+    @property
+    def num_segments(self):
+        return len(self.segment_array)
+
+    def cast_rays(self, xs, ys, angles_deg, max_distance=1000):
+        # 只有一台車的位置（純量 x, y）才用 grid，多台車的批次交給向量化的 cast_rays 比較快
+        if self.index is not None and np.ndim(xs) == 0 and np.ndim(ys) == 0:
+            return self.index.cast_rays(xs, ys, angles_deg, max_distance)
+        return cast_rays(xs, ys, angles_deg, self.segment_array, max_distance)
+
+    def in_goal(self, x, y):
+        gx1, gy1 = self.goal_tl
+        gx2, gy2 = self.goal_br
+        return gx1 <= x <= gx2 and gy2 <= y <= gy1
+
+    def hits_wall(self, x, y, radius=3):
+        if self.index is not None:
+            return self.index.circle_hits(x, y, radius)
+        hit, _ = circles_near_segments(x, y, radius, self.segment_array)
+        return bool(hit)
+
+    def collide_circles(self, xs, ys, radii=3):
+        """
+        一次判斷多台車（圓心陣列 + 半徑）有沒有撞牆
+        回傳 (hit mask, 到最近牆壁的距離)，形狀跟輸入 broadcast 後一樣
+        批次查詢不管 backend 都用向量化的暴力法（grid 的 circle_hits 一次只能查一個圓，也不會算距離）
+        """
+        return circles_near_segments(xs, ys, radii, self.segment_array)
+
+    def time_of_impact(self, x0s, y0s, x1s, y1s, radii=3, ignore_initial_contact=True):
+        """
+        連續碰撞偵測：車子從 (x0, y0) 直線移動到 (x1, y1) 的途中第一次碰到牆的時間 t ∈ [0, 1]
+        沒碰到回傳 inf，可以一次算很多段移動
+        預設忽略起點就貼著牆的情況（例如起點離下方牆壁剛好 3），只看有沒有撞進去
+        """
+        return swept_circles_time_of_impact(x0s, y0s, x1s, y1s, radii, self.segment_array, ignore_initial_contact)
+
+    def distance_field(self, resolution=0.5, cache_dir="sdf_cache"):
+        # 每個解析度只建一次，之後直接拿快取
+        key = ("sdf", resolution)
+        if key not in self._cache:
+            self._cache[key] = DistanceField.for_track(self, resolution, cache_dir)
+        return self._cache[key]